@@ -1,40 +1,59 @@
 import os
 import time
-import pickle
+from datetime import datetime
 
-import builtins as __builtin__
+from lux.log import get_logger
 
 from lux.game import Game, Missions, Observation
+from lux.game_constants import GAME_CONSTANTS
 
 from make_actions import make_city_actions, make_unit_missions, make_unit_actions, make_unit_actions_supplementary
 from make_annotations import annotate_game_state, annotate_missions, annotate_movements, filter_cell_annotations
-from imitation_agent import get_imitation_action
+from imitation_agent import warm_up
+from snapshot_writer import SnapshotWriter
+from snapshot_archive import SnapshotArchiveWriter, freeze_turn
+
+logger = get_logger("agent")
 
 game_state = Game()
 missions = Missions()
+snapshot_writer = None  # started with the first snapshot
+snapshot_archive = None
 
 
 def game_logic(game_state: Game, missions: Missions, observation: Observation, DEBUG=False):
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+    print = logger.printer(DEBUG)
 
     game_state.compute_start_time = time.time()
-    game_state.calculate_features(missions)
+    joint_assignment = bool(os.environ.get('LUX_JOINT_ASSIGNMENT', ''))  # assign the targets of the units together
+    timer = game_state.stage_timer
+    timer.reset()
+    with timer.time("calculate_features"):
+        game_state.calculate_features(missions)
     censoring = game_state.is_symmetrical()
     state_annotations = annotate_game_state(game_state)
-    reset_missions, actions_by_cities = make_city_actions(game_state, missions, DEBUG=DEBUG)
+    with timer.time("make_city_actions"):
+        reset_missions, actions_by_cities = make_city_actions(game_state, missions, DEBUG=DEBUG)
     if reset_missions or not game_state.player.researched_coal():
         print("reset_missions")
         missions.reset_missions(game_state.player.research_points,
                                 game_state.convolve(game_state.coal_exist_matrix),
                                 game_state.convolve(game_state.uranium_exist_matrix))
-        game_state.calculate_features(missions)
-    actions_by_units_initial = make_unit_actions_supplementary(game_state, missions, observation, initial=True, DEBUG=DEBUG)
-    cluster_annotations_and_ejections_pre = make_unit_missions(game_state, missions, is_subsequent_plan=False, DEBUG=DEBUG)
+        with timer.time("calculate_features"):
+            game_state.calculate_features(missions)
+    with timer.time("make_unit_actions_supplementary"):
+        actions_by_units_initial = make_unit_actions_supplementary(game_state, missions, observation, initial=True, DEBUG=DEBUG)
+    with timer.time("make_unit_missions"):
+        cluster_annotations_and_ejections_pre = make_unit_missions(game_state, missions, is_subsequent_plan=False,
+                                                                   joint_assignment=joint_assignment, DEBUG=DEBUG)
     # missions, pre_actions_by_units = make_unit_actions(game_state, missions, DEBUG=DEBUG)
-    missions, actions_by_units = make_unit_actions(game_state, missions, DEBUG=DEBUG)
-    cluster_annotations_and_ejections = make_unit_missions(game_state, missions, is_subsequent_plan=True, DEBUG=DEBUG)
-    actions_by_units_supplementary = make_unit_actions_supplementary(game_state, missions, observation, DEBUG=DEBUG)
+    with timer.time("make_unit_actions"):
+        missions, actions_by_units = make_unit_actions(game_state, missions, DEBUG=DEBUG)
+    with timer.time("make_unit_missions"):
+        cluster_annotations_and_ejections = make_unit_missions(game_state, missions, is_subsequent_plan=True,
+                                                               joint_assignment=joint_assignment, DEBUG=DEBUG)
+    with timer.time("make_unit_actions_supplementary"):
+        actions_by_units_supplementary = make_unit_actions_supplementary(game_state, missions, observation, DEBUG=DEBUG)
     movement_annotations = annotate_movements(game_state, actions_by_units)
     mission_annotations = annotate_missions(game_state, missions, DEBUG=DEBUG)
 
@@ -59,11 +78,10 @@ def game_logic(game_state: Game, missions: Missions, observation: Observation, D
 
 
 def agent(observation: Observation, configuration, DEBUG=False):
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+    print = logger.printer(DEBUG)
 
     del configuration  # unused
-    global game_state, missions
+    global game_state, missions, snapshot_writer, snapshot_archive
 
     if observation["step"] == 0:
         game_state = Game()
@@ -71,18 +89,29 @@ def agent(observation: Observation, configuration, DEBUG=False):
         game_state.player_id = observation.player
         game_state._update(observation["updates"][2:])
         game_state.fix_iteration_order()
+        # the first turn has the largest time budget
+        warm_up()
     else:
-        # actually rebuilt and recomputed from scratch
+        # map, units and cities are updated in place, features are recomputed from scratch
         game_state._update(observation["updates"])
 
     if not os.environ.get('GFOOTBALL_DATA_DIR', ''):  # on Kaggle compete, do not save items
-        str_step = str(observation["step"]).zfill(3)
-        with open('snapshots/observation-{}-{}.pkl'.format(str_step, game_state.player_id), 'wb') as handle:
-            pickle.dump(observation, handle, protocol=pickle.HIGHEST_PROTOCOL)
-        with open('snapshots/game_state-{}-{}.pkl'.format(str_step, game_state.player_id), 'wb') as handle:
-            pickle.dump(game_state, handle, protocol=pickle.HIGHEST_PROTOCOL)
-        with open('snapshots/missions-{}-{}.pkl'.format(str_step, game_state.player_id), 'wb') as handle:
-            pickle.dump(missions, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        if snapshot_writer is None:
+            snapshot_writer = SnapshotWriter()
+        if observation["step"] == 0 or snapshot_archive is None:
+            # one archive per game and player
+            if snapshot_archive is not None:
+                snapshot_writer.submit(snapshot_archive.close, droppable=False)
+            snapshot_archive = SnapshotArchiveWriter('snapshots/game-{}-{}.lxa'.format(
+                datetime.now().strftime("%Y%m%d-%H%M%S-%f"), game_state.player_id))
+        snapshot_writer.submit(snapshot_archive.append, freeze_turn(observation, game_state, missions))
+        if observation["step"] == GAME_CONSTANTS["PARAMETERS"]["MAX_DAYS"] - 1:
+            snapshot_writer.submit(snapshot_archive.close, droppable=False)
+            snapshot_writer.flush()
 
     actions, game_state, missions = game_logic(game_state, missions, observation)
+
+    if os.environ.get('LUX_TIMING_LOG', ''):  # stage timings of each turn as jsonl
+        with open(os.environ['LUX_TIMING_LOG'], 'a') as handle:
+            handle.write(game_state.stage_timer.to_json(observation["step"], game_state.player_id) + "\n")
     return actions
\ No newline at end of file
@@ -1,12 +1,11 @@
 # contains designed heuristics
 # which could be fine tuned
-import math
 import time
 
 import numpy as np
-import builtins as __builtin__
+from lux.log import get_logger
 
-from typing import Dict
+from typing import List
 from lux import annotate
 from lux import game
 
@@ -15,15 +14,14 @@ from lux.game_map import Cell, RESOURCE_TYPES
 from lux.constants import Constants
 from lux.game_position import Position
 from lux.game_constants import GAME_CONSTANTS
+from lux.assignment import min_cost_assignment
+
+logger = get_logger("heuristics")
 
 
 def find_best_cluster(game_state: Game, unit: Unit, DEBUG=False, explore=False, require_empty_target=False, ref_pos:Position=None):
 
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
-
-    # for debugging
-    score_matrix_wrt_pos = game_state.init_matrix()
+    print = logger.printer(DEBUG)
 
     # default response is not to move
     best_position = unit.pos
@@ -34,6 +32,121 @@ def find_best_cluster(game_state: Game, unit: Unit, DEBUG=False, explore=False,
         # running out of time
         return best_position, best_cell_value, cluster_annotation
 
+    best_cell_value = anticipate_staying(game_state, unit, cluster_annotation, DEBUG=DEBUG)
+
+    ys, xs, cell_values, target_bonus = score_targets(game_state, unit, DEBUG=DEBUG, explore=explore,
+                                                      require_empty_target=require_empty_target, ref_pos=ref_pos)
+    target_leaders = game_state.xy_to_resource_group_id.labels[ys, xs]
+    same_cluster = target_leaders == game_state.xy_to_resource_group_id.find(tuple(unit.pos))
+
+    # update best target, the first best cell in the iteration order is taken
+    if len(ys):
+        order = np.lexsort([game_state.iteration_rank_matrix[ys, xs]] + [-cell_value for cell_value in cell_values[::-1]])
+        best = order[0]
+        cell_value = [cell_value[best].item() for cell_value in cell_values]
+        if cell_value > best_cell_value:
+            best_cell_value = cell_value
+            best_position = Position(int(xs[best]), int(ys[best]))
+
+    target_bonus_for_current_cluster_logging = -999
+    if np.any(same_cluster):
+        target_bonus_for_current_cluster_logging = max(-999, target_bonus[same_cluster].max())
+
+    # annotate if target bonus is more than one
+    if best_cell_value[0] > target_bonus_for_current_cluster_logging > -999:
+        # best tile of each cluster
+        order = np.lexsort([ys, xs] + cell_values[::-1] + [target_leaders])
+        sorted_leaders = target_leaders[order]
+        best_of_cluster = order[np.append(sorted_leaders[1:] != sorted_leaders[:-1], True)]
+        best_citytile_of_cluster = [([cell_value[best].item() for cell_value in cell_values], int(xs[best]), int(ys[best]))
+                                    for best in best_of_cluster]
+        for cell_value,x,y in sorted(best_citytile_of_cluster)[:10]:
+            annotation = annotate.text(x,y,f"{int(cell_value[0])}")
+            cluster_annotation.append(annotation)
+            annotation = annotate.line(unit.pos.x,unit.pos.y,x,y)
+            cluster_annotation.append(annotation)
+
+    return best_position, best_cell_value, cluster_annotation
+
+
+def assign_best_clusters(game_state: Game, units: List[Unit], DEBUG=False) -> List:
+    # best position, cell value and annotations of each unit, with the targets of all units chosen together
+    # the targets are scored against the same targeting sets, and one assignment maximises the total over the units
+    print = logger.printer(DEBUG)
+
+    responses = [(unit.pos, [0,0,0,0], []) for unit in units]
+    if time.time() - game_state.compute_start_time > 3:
+        # running out of time
+        return responses
+
+    # units that stay are not assigned a target
+    scored = []
+    for index, unit in enumerate(units):
+        cluster_annotation = []
+        best_cell_value = anticipate_staying(game_state, unit, cluster_annotation, DEBUG=DEBUG)
+        if best_cell_value > [0,0,0,0]:
+            responses[index] = (unit.pos, best_cell_value, cluster_annotation)
+            continue
+        ys, xs, cell_values, _ = score_targets(game_state, unit, DEBUG=DEBUG)
+        scored.append((index, ys, xs, cell_values))
+
+    if not scored or not any(len(ys) for _, ys, _, _ in scored):
+        return responses
+
+    # the pairs of unit and target, as vectors
+    pair_unit = np.concatenate([np.full(len(ys), row) for row, (_, ys, _, _) in enumerate(scored)])
+    pair_ys = np.concatenate([ys for _, ys, _, _ in scored])
+    pair_xs = np.concatenate([xs for _, _, xs, _ in scored])
+    pair_values = [np.concatenate([cell_values[term] for _, _, _, cell_values in scored]) for term in range(4)]
+
+    # cell values are compared as lists, the utility of a pair is its rank among the cell values above not moving
+    values = np.vstack([np.column_stack(pair_values), np.zeros((1, 4))])
+    order = np.lexsort(values.T[::-1])
+    ranks = np.empty(len(values), dtype=int)
+    ranks[order] = np.cumsum(np.append(False, np.any(values[order][1:] != values[order][:-1], axis=1)))
+    utility = ranks[:-1] - ranks[-1]
+
+    # a column for each target tile, shared uranium tiles have a column for each unit
+    tiles, tile_of_pair = np.unique(pair_ys * game_state.map_width + pair_xs, return_inverse=True)
+    shareable = np.zeros(len(tiles), dtype=bool)
+    if game_state.player.researched_uranium_projected():
+        shareable = game_state.shareable_target_matrix.ravel()[tiles]
+    tile_widths = np.where(shareable, len(scored), 1)
+    tile_offsets = np.cumsum(tile_widths) - tile_widths
+    pair_column = tile_offsets[tile_of_pair] + np.where(shareable[tile_of_pair], pair_unit, 0)
+
+    # a column for each unit to not move, pairs with no utility are not allowed
+    num_columns = tile_widths.sum() + len(scored)
+    infeasible = (max(0, utility.max()) + 1) * len(scored) + 1
+    cost = np.full((len(scored), num_columns), infeasible)
+    cost[np.arange(len(scored)), tile_widths.sum() + np.arange(len(scored))] = 0
+    feasible = utility > 0
+    cost[pair_unit[feasible], pair_column[feasible]] = -utility[feasible]
+    pair_at = np.full((len(scored), num_columns), -1)
+    pair_at[pair_unit, pair_column] = np.arange(len(pair_unit))
+
+    assignment = min_cost_assignment(cost)
+
+    for row, (index, _, _, _) in enumerate(scored):
+        pair = pair_at[row, assignment[row]]
+        if pair < 0 or not feasible[pair]:
+            continue
+        unit = units[index]
+        x, y = int(pair_xs[pair]), int(pair_ys[pair])
+        best_cell_value = [pair_value[pair].item() for pair_value in pair_values]
+        print("assigned", unit.id, unit.pos, "->", (x, y), best_cell_value)
+        cluster_annotation = [annotate.text(x,y,f"{int(best_cell_value[0])}"), annotate.line(unit.pos.x,unit.pos.y,x,y)]
+        responses[index] = (Position(x, y), best_cell_value, cluster_annotation)
+
+    return responses
+
+
+def anticipate_staying(game_state: Game, unit: Unit, cluster_annotation: List, DEBUG=False) -> List:
+    # the cell value of staying, which is more than any target if the unit should stay
+    print = logger.printer(DEBUG)
+
+    best_cell_value = [0,0,0,0]
+
     # if at night, if near enemy or almost dawn, if city is going to die, if staying can keep the city alive
     if not game_state.is_day_time:
         cityid = game_state.map.get_cityid_of_cell(unit.pos.x, unit.pos.y)
@@ -86,6 +199,16 @@ def find_best_cluster(game_state: Game, unit: Unit, DEBUG=False, explore=False,
             annotation = annotate.text(unit.pos.x, unit.pos.y, "SX")
             cluster_annotation.append(annotation)
 
+    return best_cell_value
+
+
+def score_targets(game_state: Game, unit: Unit, DEBUG=False, explore=False, require_empty_target=False, ref_pos:Position=None):
+    # the tiles the unit may target, with the four terms of their cell values and the target bonus, as vectors
+    print = logger.printer(DEBUG)
+
+    # for debugging
+    score_matrix_wrt_pos = game_state.init_matrix()
+
     # only consider other cluster if the current cluster has more than one agent mining
     consider_different_cluster = False
     # must consider other cluster if the current cluster has more agent than tiles
@@ -94,7 +217,7 @@ def find_best_cluster(game_state: Game, unit: Unit, DEBUG=False, explore=False,
     # calculate how many resource tiles and how many units on the current cluster
     current_leader = game_state.xy_to_resource_group_id.find(tuple(unit.pos))
     units_mining_on_current_cluster = game_state.resource_leader_to_locating_units[current_leader] & game_state.resource_leader_to_targeting_units[current_leader]
-    resource_size_of_current_cluster = game_state.xy_to_resource_group_id.get_point(current_leader)
+    resource_size_of_current_cluster = game_state.xy_to_resource_group_id.get_leader_point(current_leader)
     if game_state.distance_from_opponent_assets[unit.pos.y, unit.pos.x] > 10:
         if resource_size_of_current_cluster > 1:
             resource_size_of_current_cluster = resource_size_of_current_cluster//2
@@ -113,209 +236,146 @@ def find_best_cluster(game_state: Game, unit: Unit, DEBUG=False, explore=False,
 
     print("finding best cluster for", unit.id, unit.pos, consider_different_cluster, consider_different_cluster_must)
 
-    best_citytile_of_cluster: Dict = dict()
-    target_bonus_for_current_cluster_logging = -999
-
-    for y in game_state.y_iteration_order:
-        for x in game_state.x_iteration_order:
-
-            # what not to target
-            if (x,y) in game_state.targeted_for_building_xy_set:
-                continue
-            if (x,y) in game_state.opponent_city_tile_xy_set:
-                continue
-            if (x,y) in game_state.player_city_tile_xy_set:
-                continue
-
-            if ref_pos:
-                if abs(ref_pos.x - x) + abs(ref_pos.y - y) < abs(unit.pos.x - x) + abs(unit.pos.y - y):
-                    continue
-
-            # allow multi targeting of uranium mines
-            if game_state.convolved_uranium_exist_matrix[y,x] == 0 or \
-                not game_state.player.researched_uranium_projected() or \
-                    game_state.matrix_player_cities_nights_of_fuel_required_for_night[y,x] <= 0:
-                if (x,y) in game_state.targeted_xy_set:
-                    continue
-
-            if require_empty_target and len(units_mining_on_current_cluster) <= 2:
-                continue
-
-            distance = game_state.retrieve_distance(unit.pos.x, unit.pos.y, x, y)
-
-            # cluster targeting logic
-
-            # target bonus should have the same value for the entire cluster
-            target_bonus = 1
-            target_leader = game_state.xy_to_resource_group_id.find((x,y))
-            if consider_different_cluster or consider_different_cluster_must:
-                # if the target is a cluster and not the current cluster
-                if target_leader:
-
-                    units_targeting_or_mining_on_target_cluster = \
-                        game_state.resource_leader_to_locating_units[target_leader] | \
-                        game_state.resource_leader_to_targeting_units[target_leader]
-
-                    if require_empty_target and units_targeting_or_mining_on_target_cluster:
-                        continue
-                    resource_size_of_target_cluster = game_state.xy_to_resource_group_id.get_point(target_leader)
-
-                    # target bonus depends on how many resource tiles and how many units that are mining or targeting
-                    target_bonus = resource_size_of_target_cluster/\
-                                   (1 + len(units_targeting_or_mining_on_target_cluster))
-
-                    # avoid targeting overpopulated clusters
-                    if len(units_targeting_or_mining_on_target_cluster) > resource_size_of_target_cluster:
-                        target_bonus = target_bonus * 0.1
-
-                    # if none of your units is targeting the cluster and definitely reachable
-                    if len(units_targeting_or_mining_on_target_cluster) == 0:
-                        if distance <= game_state.distance_from_opponent_assets[y,x]:
-                            target_bonus = target_bonus * 10
-
-                    # discourage targeting depending are you the closest unit to the resource
-                    distance_bonus = max(1,game_state.distance_from_player_assets[y,x])/max(1,distance)
+    # only the candidate tiles within the travel range of the unit are scored, the terms of the score are vectors over these tiles
+    # the terms that do not depend on the unit are computed with the features in calculate_target_matrices
+    ys, xs = game_state.target_candidates.within(unit.pos.x, unit.pos.y, unit.travel_range)
+    at = (ys, xs)
+    clusters = game_state.xy_to_resource_group_id
+    target_leaders = clusters.labels[at]
+    same_cluster = target_leaders == current_leader
+    distance = game_state.retrieve_distances(unit.pos.x, unit.pos.y, xs, ys)
 
-                    if require_empty_target and distance_bonus < 1:
-                        continue
+    # what not to target
+    targetable = ~game_state.mask_from_set(game_state.targeted_for_building_xy_set)[at]
 
-                    if consider_different_cluster_must:
-                        distance_bonus = max(1/2, distance_bonus)
+    if ref_pos:
+        targetable &= abs(ref_pos.x - xs) + abs(ref_pos.y - ys) >= abs(unit.pos.x - xs) + abs(unit.pos.y - ys)
 
-                    target_bonus = target_bonus * distance_bonus**2
+    # allow multi targeting of uranium mines
+    targeted = game_state.mask_from_set(game_state.targeted_xy_set)[at]
+    if game_state.player.researched_uranium_projected():
+        targeted &= ~game_state.shareable_target_matrix[at]
+    targetable &= ~targeted
+
+    if require_empty_target and len(units_mining_on_current_cluster) <= 2:
+        targetable[:] = False
+
+    # cluster targeting logic
+
+    # target bonus should have the same value for the entire cluster
+    target_bonus = np.ones(target_leaders.shape)
+    if consider_different_cluster or consider_different_cluster_must:
+        units_targeting_or_mining_on_cluster = np.zeros(clusters.labels.size, dtype=int)
+        for leader in set(game_state.resource_leader_to_locating_units) | set(game_state.resource_leader_to_targeting_units):
+            units_targeting_or_mining_on_cluster[leader] = len(
+                game_state.resource_leader_to_locating_units.get(leader, set()) |
+                game_state.resource_leader_to_targeting_units.get(leader, set()))
+        units_targeting_or_mining_on_target_cluster = units_targeting_or_mining_on_cluster[target_leaders]
+
+        if require_empty_target:
+            targetable &= units_targeting_or_mining_on_target_cluster == 0
+        resource_size_of_target_cluster = clusters.points[target_leaders]
+
+        # target bonus depends on how many resource tiles and how many units that are mining or targeting
+        target_bonus = resource_size_of_target_cluster/(1 + units_targeting_or_mining_on_target_cluster)
+
+        # avoid targeting overpopulated clusters
+        target_bonus = np.where(units_targeting_or_mining_on_target_cluster > resource_size_of_target_cluster,
+                                target_bonus * 0.1, target_bonus)
+
+        # if none of your units is targeting the cluster and definitely reachable
+        target_bonus = np.where((units_targeting_or_mining_on_target_cluster == 0) &
+                                (distance <= game_state.distance_from_opponent_assets[at]), target_bonus * 10, target_bonus)
+
+        # discourage targeting depending are you the closest unit to the resource
+        distance_bonus = np.maximum(1,game_state.distance_from_player_assets[at])/np.maximum(1,distance)
+
+        if require_empty_target:
+            targetable &= distance_bonus >= 1
+
+        if consider_different_cluster_must:
+            distance_bonus = np.maximum(1/2, distance_bonus)
+
+        target_bonus = target_bonus * python_square(distance_bonus)
+
+        # extra bonus if you are closest to the target
+        target_bonus = np.where(distance_bonus == 1, target_bonus * 10, target_bonus)
+
+        # travel penalty
+        target_bonus = target_bonus / game_state.travel_penalty_matrix[at]
+
+        # if targeted cluster is much closer to enemy, do not target if cannot survive the night
+        # resources is required for invasion
+        if unit.night_turn_survivable < 10:
+            target_bonus = np.where(game_state.invasion_target_matrix[at], target_bonus * 0.01, target_bonus)
+
+        # slightly discourage targeting clusters closer to enemy
+        target_bonus = np.where(game_state.contested_target_matrix[at], target_bonus * 0.9, target_bonus)
+
+    # if targeting same cluster do not move more than five
+    targetable &= ~same_cluster | (distance <= 5)
+
+    if consider_different_cluster_must:
+        # enforce targeting of other clusters
+        target_bonus = np.where(same_cluster, target_bonus, target_bonus * 10)
+    else:
+        target_bonus = np.where(same_cluster, target_bonus * 2, target_bonus)
+
+    # only target cells where you can collect resources
+    if unit.night_turn_survivable < 10:
+        targetable &= game_state.convolved_collectable_tiles_matrix[at] != 0
+
+    # do not plan overnight missions if you are the only unit mining
+    if tuple(unit.pos) in game_state.convolved_collectable_tiles_xy_set:
+        if len(units_mining_on_current_cluster) <= 1:
+            targetable &= distance <= 15
+
+    # estimate target score
+    targetable &= distance <= unit.travel_range
+
+    # penalty on parameter preference
+    # if not collectable and not buildable, penalise
+    preference = game_state.target_preference_matrix[at]
+
+    # prefer to mine advanced resources faster
+    if unit.get_cargo_space_left() > 8:
+        if game_state.player.researched_coal_projected():
+            preference = preference + 2*game_state.convolved_coal_exist_matrix[at]
+        if game_state.player.researched_uranium_projected():
+            preference = preference + 2*game_state.convolved_uranium_exist_matrix[at]
 
-                    if distance_bonus == 1:
-                        # extra bonus if you are closest to the target
-                        target_bonus = target_bonus * 10
+    # if mining advanced resource, stand your ground unless there is a direct path
+    if game_state.convolved_coal_exist_matrix[unit.pos.y,unit.pos.x] or game_state.convolved_uranium_exist_matrix[unit.pos.y,unit.pos.x]:
+        targetable &= distance <= abs(unit.pos.x - xs) + abs(unit.pos.y - ys)
 
-                    # travel penalty
-                    target_bonus = target_bonus / math.log(4 + game_state.xy_to_resource_group_id.get_dist_from_player((x,y),), 2)
+    # the early game penalties on the position are in target_position_matrix
+    position = game_state.target_position_matrix[at] - 2 * distance
 
-                    # if targeted cluster is much closer to enemy, do not target if cannot survive the night
-                    # resources is required for invasion
-                    if game_state.distance_from_opponent_assets[y,x] + 5 < \
-                       game_state.xy_to_resource_group_id.get_dist_from_player((x,y),):
-                        if unit.night_turn_survivable < 10:
-                            target_bonus = target_bonus * 0.01
-
-                    # slightly discourage targeting clusters closer to enemy
-                    if game_state.xy_to_resource_group_id.get_dist_from_opponent((x,y),) < \
-                       game_state.xy_to_resource_group_id.get_dist_from_player((x,y),):
-                        target_bonus = target_bonus * 0.9
-
-            if target_leader and target_leader == current_leader:
-                # if targeting same cluster do not move more than five
-                if distance > 5:
-                    continue
-
-            if consider_different_cluster_must and target_leader != current_leader:
-                # enforce targeting of other clusters
-                target_bonus = target_bonus * 10
-
-            if not consider_different_cluster_must and target_leader == current_leader:
-                target_bonus = target_bonus * 2
+    # discourage if you are in the citytile, and you are targeting the location beside you with one wood side
+    # specific case to avoid this sort of targeting (A -> X), probably encourage (A -> Z) or (A -> Y)
+    #
+    #   AX
+    #  ZWWY
+    if tuple(unit.pos) in game_state.player_city_tile_xy_set:
+        position = position - 5 * ((distance == 1) & game_state.single_wood_side_matrix[at])
 
-            # only target cells where you can collect resources
-            if game_state.convolved_collectable_tiles_matrix_projected[y,x] == 0:
-                continue
+    proximity = - distance - game_state.opponent_units_matrix[at] * 2
 
-            if unit.night_turn_survivable < 10:
-                if game_state.convolved_collectable_tiles_matrix[y,x] == 0:
-                    continue
+    # if more than 20 uranium do not target a wood cluster so that it can home
+    cluster_value = target_bonus
+    if unit.cargo.uranium > 20:
+        cluster_value = np.where(game_state.wood_only_matrix[at], -1, target_bonus)
 
-            # identation to retain commit history
-            if True:
-                # do not plan overnight missions if you are the only unit mining
-                if tuple(unit.pos) in game_state.convolved_collectable_tiles_xy_set:
-                    if len(units_mining_on_current_cluster) <= 1 and distance > 15:
-                        continue
-
-                # estimate target score
-                if distance <= unit.travel_range:
-                    cell_value = [target_bonus,
-                                  - game_state.distance_from_floodfill_by_empty_tile[y,x],
-                                  - game_state.distance_from_resource_median[y,x]
-                                  - distance - game_state.distance_from_opponent_assets[y,x]
-                                  - distance + game_state.distance_from_player_unit_median[y,x],
-                                  - distance - game_state.opponent_units_matrix[y,x] * 2]
-
-                    # penalty on parameter preference
-                    # if not collectable and not buildable, penalise
-                    if (x,y) not in game_state.collectable_tiles_xy_set and (x,y) not in game_state.buildable_tile_xy_set:
-                        cell_value[1] -= 1
-
-                    # prefer to mine advanced resources faster
-                    if unit.get_cargo_space_left() > 8:
-                        if game_state.player.researched_coal_projected():
-                            cell_value[1] += 2*game_state.convolved_coal_exist_matrix[y,x]
-                        if game_state.player.researched_uranium_projected():
-                            cell_value[1] += 2*game_state.convolved_uranium_exist_matrix[y,x]
-
-                    # if mining advanced resource, stand your ground unless there is a direct path
-                    if game_state.convolved_coal_exist_matrix[unit.pos.y,unit.pos.x] or game_state.convolved_uranium_exist_matrix[unit.pos.y,unit.pos.x]:
-                        if distance > abs(unit.pos.x - x) + abs(unit.pos.y - y):
-                            continue
-
-                    # discourage if the target is one unit closer to the enemy, in the early game
-                    # specific case to avoid this sort of targeting (A -> X)
-                    #    X
-                    # WABW
-                    # WWWW
-                    if game_state.distance_from_opponent_assets[y,x] + 1 == game_state.distance_from_player_units[y,x]:
-                        if game_state.turn < 80:
-                            cell_value[2] -= 2
-
-                    # for first target prefer B over A
-                    #   X
-                    # BWWW
-                    #  WWW
-                    #  AX
-                    if game_state.distance_from_opponent_assets[y,x] == 1 and game_state.distance_from_player_assets[y,x] > 2:
-                        if game_state.turn < 1:
-                            cell_value[2] -= 2
-
-                    # discourage if you are in the citytile, and you are targeting the location beside you with one wood side
-                    # specific case to avoid this sort of targeting (A -> X), probably encourage (A -> Z) or (A -> Y)
-                    #
-                    #   AX
-                    #  ZWWY
-                    if tuple(unit.pos) in game_state.player_city_tile_xy_set:
-                        if Position(x,y) - unit.pos == 1:
-                            if game_state.convolved_wood_exist_matrix[y,x] == 1 and game_state.resource_collection_rate[y,x] == 20:
-                                if game_state.distance_from_opponent_units[y,x] > 2:
-                                    cell_value[2] -= 5
-
-
-                    # if more than 20 uranium do not target a wood cluster so that it can home
-                    if unit.cargo.uranium > 20:
-                        if game_state.convolved_wood_exist_matrix[y,x]*20 == game_state.resource_collection_rate[y,x]:
-                            cell_value[0] = -1
-
-                    # for debugging
-                    score_matrix_wrt_pos[y,x] = cell_value[2]
-
-                    # update best target
-                    if cell_value > best_cell_value:
-                        best_cell_value = cell_value
-                        best_position = Position(x,y)
-
-                    if target_leader not in best_citytile_of_cluster:
-                        best_citytile_of_cluster[target_leader] = (cell_value,x,y)
-                    if (cell_value,x,y) > best_citytile_of_cluster[target_leader]:
-                        best_citytile_of_cluster[target_leader] = (cell_value,x,y)
-
-                    if target_leader == current_leader:
-                        target_bonus_for_current_cluster_logging = max(target_bonus_for_current_cluster_logging, target_bonus)
-
-    # annotate if target bonus is more than one
-    if best_cell_value[0] > target_bonus_for_current_cluster_logging > -999:
-        for cell_value,x,y in sorted(best_citytile_of_cluster.values())[:10]:
-            annotation = annotate.text(x,y,f"{int(cell_value[0])}")
-            cluster_annotation.append(annotation)
-            annotation = annotate.line(unit.pos.x,unit.pos.y,x,y)
-            cluster_annotation.append(annotation)
+    cell_values = [cluster_value, preference, position, proximity]
 
     # for debugging
+    score_matrix_wrt_pos[ys[targetable], xs[targetable]] = position[targetable]
     game_state.heuristics_from_positions[tuple(unit.pos)] = score_matrix_wrt_pos
 
-    return best_position, best_cell_value, cluster_annotation
\ No newline at end of file
+    return ys[targetable], xs[targetable], [cell_value[targetable] for cell_value in cell_values], target_bonus[targetable]
+
+
+def python_square(values: np.ndarray) -> np.ndarray:
+    # squares as computed by python floats, numpy multiplies which may differ in the last bit
+    distinct_values, inverse = np.unique(values.ravel(), return_inverse=True)
+    return np.array([value**2 for value in distinct_values.tolist()])[inverse].reshape(values.shape)
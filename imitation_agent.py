@@ -1,85 +1,94 @@
 import os
 import numpy as np
-import torch
 import time
 
-from typing import Set
+from typing import List, Set
 from lux import annotate
 from lux.game import Game, Observation, Unit
-import builtins as __builtin__
+from lux.game_records import UpdateRecords, parse_updates
+from lux.log import get_logger, lazy
 import random
 
 random.seed(42)
 
+logger = get_logger("imitation_agent")
+
 
 path = os.path.dirname(os.path.realpath(__file__))
-model = torch.jit.load(f'{path}/model.pth')
-model.eval()
+model = None  # loaded on first use, so that importing this module does not import torch
+
+
+def get_model():
+    global model
+    if model is None:
+        from inference_backend import InferenceBackend
+        model = InferenceBackend(f'{path}/model.pth',
+                                 num_threads=int(os.environ.get('LUX_NUM_THREADS', 0)),
+                                 quantize=bool(os.environ.get('LUX_QUANTIZE', '')))
+    return model
+
+
+def warm_up(number_of_batches=2):
+    # load the model and run dummy batches, torchscript optimises the model over the first calls
+    backend = get_model()
+    for _ in range(number_of_batches):
+        backend(np.zeros((8, 20, 32, 32), dtype=np.float32))
+
+
+def _last_occurrence(keys):
+    # rows holding the last occurrence of each key, so that repeated cells behave as sequential writes
+    _, index_in_reversed = np.unique(keys[::-1], return_index=True)
+    return len(keys) - 1 - index_in_reversed
+
+
+def _previous_occurrence(keys):
+    # for each row, the previous row with the same key or -1, and whether the row is the last with its key
+    order = np.argsort(keys, kind='stable')
+    same_as_previous = np.zeros(len(keys), dtype=bool)
+    same_as_previous[1:] = keys[order][1:] == keys[order][:-1]
+    previous = np.full(len(keys), -1)
+    previous[order[same_as_previous]] = order[np.nonzero(same_as_previous)[0] - 1]
+    is_last = np.ones(len(keys), dtype=bool)
+    is_last[order[:-1][same_as_previous[1:]]] = False
+    return previous, is_last
 
 
-def make_input(obs: Observation, unit_id: str):
+def make_input_base(obs: Observation, records: UpdateRecords):
+    # channels 2-19 are shared by every unit in the turn, here channels 2-7 contain all the units
     width, height = obs['width'], obs['height']
     x_shift = (32 - width) // 2
     y_shift = (32 - height) // 2
-    cities = {}
 
     b = np.zeros((20, 32, 32), dtype=np.float32)
 
-    for update in obs['updates']:
-        strs = update.split(' ')
-        input_identifier = strs[0]
-
-        if input_identifier == 'u':
-            x = int(strs[4]) + x_shift
-            y = int(strs[5]) + y_shift
-            wood = int(strs[7])
-            coal = int(strs[8])
-            uranium = int(strs[9])
-            if unit_id == strs[3]:
-                # Position and Cargo
-                b[:2, x, y] = (
-                    1,
-                    (wood + coal + uranium) / 100
-                )
-            else:
-                # Units
-                team = int(strs[2])
-                cooldown = float(strs[6])
-                idx = 2 + (team - obs['player']) % 2 * 3
-                b[idx:idx + 3, x, y] = (
-                    1,
-                    cooldown / 6,
-                    (wood + coal + uranium) / 100
-                )
-        elif input_identifier == 'ct':
-            # CityTiles
-            team = int(strs[1])
-            city_id = strs[2]
-            x = int(strs[3]) + x_shift
-            y = int(strs[4]) + y_shift
-            idx = 8 + (team - obs['player']) % 2 * 2
-            b[idx:idx + 2, x, y] = (
-                1,
-                cities[city_id]
-            )
-        elif input_identifier == 'r':
-            # Resources
-            r_type = strs[1]
-            x = int(strs[2]) + x_shift
-            y = int(strs[3]) + y_shift
-            amt = int(float(strs[4]))
-            b[{'wood': 12, 'coal': 13, 'uranium': 14}[r_type], x, y] = amt / 800
-        elif input_identifier == 'rp':
-            # Research Points
-            team = int(strs[1])
-            rp = int(strs[2])
-            b[15 + (team - obs['player']) % 2, :] = min(rp, 200) / 200
-        elif input_identifier == 'c':
-            # Cities
-            city_id = strs[2]
-            fuel = float(strs[3])
-            lightupkeep = float(strs[4])
-            cities[city_id] = min(fuel / lightupkeep, 10) / 10
+    # Units
+    units = records.units
+    x = units['x'] + x_shift
+    y = units['y'] + y_shift
+    idx = 2 + (units['team'].astype(int) - obs['player']) % 2 * 3
+    last = _last_occurrence(idx * 1024 + x * 32 + y)
+    b[idx[last], x[last], y[last]] = 1
+    b[idx[last] + 1, x[last], y[last]] = units['cooldown'][last] / 6
+    b[idx[last] + 2, x[last], y[last]] = (units['wood'] + units['coal'] + units['uranium'])[last] / 100
+
+    # Cities
+    cities = np.minimum(records.cities['fuel'] / records.cities['light_upkeep'], 10) / 10
+
+    # CityTiles
+    citytiles = records.citytiles
+    idx = 8 + (citytiles['team'] - obs['player']) % 2 * 2
+    x = citytiles['x'] + x_shift
+    y = citytiles['y'] + y_shift
+    b[idx, x, y] = 1
+    b[idx + 1, x, y] = cities[citytiles['city']]
+
+    # Resources
+    resources = records.resources
+    b[11 + resources['type'], resources['x'] + x_shift, resources['y'] + y_shift] = resources['amount'] / 800
+
+    # Research Points
+    for team, rp in enumerate(records.research_points.tolist()):
+        b[15 + (team - obs['player']) % 2, :] = min(rp, 200) / 200
 
     # Day/Night Cycle
     b[17, :] = obs['step'] % 40 / 40
@@ -91,6 +100,47 @@ def make_input(obs: Observation, unit_id: str):
     return b
 
 
+def make_inputs(obs: Observation, unit_ids: List[str], records: UpdateRecords = None):
+    # the shared base is copied for every unit, then the unit is stamped into channels 0-1 and taken out of channels 2-7
+    if records is None:
+        records = parse_updates(obs['updates'])
+    x_shift = (32 - obs['width']) // 2
+    y_shift = (32 - obs['height']) // 2
+
+    b = np.repeat(make_input_base(obs, records)[None], len(unit_ids), axis=0)
+
+    units = records.units
+    x = units['x'] + x_shift
+    y = units['y'] + y_shift
+    cooldown = units['cooldown'] / 6
+    cargo = (units['wood'] + units['coal'] + units['uranium']) / 100
+    idx = 2 + (units['team'].astype(int) - obs['player']) % 2 * 3
+    previous, is_last = _previous_occurrence(idx * 1024 + x * 32 + y)
+
+    row_by_id = {unit_id: row for row, unit_id in enumerate(records.unit_ids)}
+    rows = np.array([row_by_id.get(unit_id, -1) for unit_id in unit_ids], dtype=int)
+    k = np.nonzero(rows >= 0)[0]
+    r = rows[k]
+
+    # Position and Cargo
+    b[k, 0, x[r], y[r]] = 1
+    b[k, 1, x[r], y[r]] = cargo[r]
+
+    # the cell shows the unit written before this unit, or nothing
+    k, r = k[is_last[r]], r[is_last[r]]
+    p = previous[r]
+    has_previous = p >= 0
+    b[k, idx[r], x[r], y[r]] = has_previous
+    b[k, idx[r] + 1, x[r], y[r]] = np.where(has_previous, cooldown[p], 0)
+    b[k, idx[r] + 2, x[r], y[r]] = np.where(has_previous, cargo[p], 0)
+
+    return b
+
+
+def make_input(obs: Observation, unit_id: str, records: UpdateRecords = None):
+    return make_inputs(obs, [unit_id], records)[0]
+
+
 def probabilistic_sort(logits):
     probs = np.exp(logits)/np.sum(np.exp(logits))
     pool = [(i,x) for i,x in enumerate(probs)]
@@ -133,15 +183,39 @@ def invert_permute(permute):
 transforms = [(transform, invert_permute(permute)) for transform, permute in transforms]
 
 
+def make_transform_tables(size=32):
+    # the transforms as gather indices into the flattened board, in the order of the shuffled transforms
+    board = np.arange(size * size).reshape(1, size, size)
+    return np.array([transform(board).reshape(-1) for transform, inv_permute in transforms])
+
+# the inputs are always padded to 32x32, so one table serves every map size
+transform_tables = make_transform_tables()
+inv_permutes = np.array([inv_permute for transform, inv_permute in transforms])
+
+
+def apply_transforms(states, number_of_transforms):
+    # (units, 20, 32, 32) into (units * transforms, 20, 32, 32), the transforms of each unit are adjacent
+    n, c, h, w = states.shape
+    transformed_states = states.reshape(n, c, h * w)[:, :, transform_tables[:number_of_transforms]]
+    return np.ascontiguousarray(transformed_states.transpose(0, 2, 1, 3)).reshape(n * number_of_transforms, c, h, w)
+
+
+def invert_transforms(policies, number_of_transforms):
+    # (units * transforms, 6) into (units, transforms, 6) with the move directions permuted back
+    policies = policies.reshape(-1, number_of_transforms, 6).copy()
+    permutes = np.broadcast_to(inv_permutes[None, :number_of_transforms], policies[:, :, :4].shape)
+    policies[:, :, :4] = np.take_along_axis(policies[:, :, :4], permutes, axis=2)
+    return policies
+
+
 def get_action(policy, game_state: Game, unit: Unit, dest: Set, DEBUG=False, use_probabilistic_sort=False):
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+    print = logger.printer(DEBUG)
 
     order = np.argsort(policy)[::-1]
     if use_probabilistic_sort:
         order = probabilistic_sort(policy)
 
-    print(np.round(policy, 2))
+    print(lazy(lambda: np.round(policy, 2)))
     print(order)
     annotations = []
     for label in order:
@@ -175,57 +249,76 @@ def get_action(policy, game_state: Game, unit: Unit, dest: Set, DEBUG=False, use
 
 
 def get_imitation_action(observation: Observation, game_state: Game, unit: Unit, DEBUG=False, use_probabilistic_sort=False):
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+    return get_imitation_actions(observation, game_state, [unit], DEBUG=DEBUG, use_probabilistic_sort=use_probabilistic_sort)
+
+
+def get_imitation_actions(observation: Observation, game_state: Game, units: List[Unit], DEBUG=False, use_probabilistic_sort=False):
+    # the inputs of all units are evaluated in one forward pass
+    # the actions are then resolved in the order of the units, so that each unit sees the destinations of the previous units
+    print = logger.printer(DEBUG)
+
+    if not units:
+        return []
 
     start_time = time.time()
 
     # Worker Actions
     dest = game_state.occupied_xy_set
-    state = make_input(observation, unit.id)
-
-    average_policy = np.zeros(6)
-    ranked_policy = np.zeros(6)
     NUMBER_OF_TRANSFORMS = game_state.number_of_transforms
     # NUMBER_OF_TRANSFORMS = 1
 
-    with torch.no_grad():
-
-        transformed_states = np.zeros((NUMBER_OF_TRANSFORMS, 20, 32, 32), dtype=np.float32)
-        for i, (transform, inv_permute) in enumerate(transforms[:NUMBER_OF_TRANSFORMS]):
-            transformed_state = transform(state)
-            transformed_states[i,:,:,:] = transformed_state
-        transformed_states = torch.from_numpy(transformed_states)
-
-        p = model(transformed_states)
-        for (transform, inv_permute), policy in zip(transforms, p.numpy()):
-            policy[:4] = policy[inv_permute]
-            print(np.round(policy, 2))
-            # booster considering transfer actions are discarded
-            if tuple(unit.pos) in game_state.wood_exist_xy_set:
-                policy[-1] += 0.25
-
-            if game_state.player.researched_coal_projected():
-                if tuple(unit.pos) in game_state.coal_exist_xy_set:
-                    policy[-1] += 0.75
-
-            if game_state.player.researched_uranium():
-                policy[-1] += game_state.convolved_uranium_exist_matrix[unit.pos.y, unit.pos.x]
-
-            if game_state.player.researched_uranium_projected():
-                if tuple(unit.pos) in game_state.uranium_exist_xy_set:
-                    policy[-1] += 1.25
-
-            average_policy += policy/NUMBER_OF_TRANSFORMS
-            ranked_policy += policy.argsort().argsort()
-
-    print(ranked_policy)
-    print(average_policy)
-
-    action, pos, annotations = get_action(average_policy, game_state, unit, dest, DEBUG=DEBUG, use_probabilistic_sort=use_probabilistic_sort)
-    if tuple(pos):
-        dest.add(tuple(pos))
-    print(unit.id, unit.pos, pos, action, time.time() - start_time)
-    print()
-
-    return [action] + annotations
\ No newline at end of file
+    states = make_inputs(observation, [unit.id for unit in units], game_state.update_records)
+
+    # the measured latency decides the number of transforms for the following turns
+    budget = game_state.inference_budget
+    units_per_batch = budget.units_per_batch(NUMBER_OF_TRANSFORMS)
+    p = []
+    with game_state.stage_timer.time("imitation_inference"):
+        for i in range(0, len(units), units_per_batch):
+            transformed_states = apply_transforms(states[i:i+units_per_batch], NUMBER_OF_TRANSFORMS)
+            forward_start_time = time.time()
+            p.append(get_model()(transformed_states))
+            budget.observe(len(transformed_states), time.time() - forward_start_time)
+    p = np.concatenate(p)
+    print("forward pass", len(units), "units", time.time() - start_time, "ms per sample", budget.sample_latency)
+
+    policies = invert_transforms(p, NUMBER_OF_TRANSFORMS)
+    print(lazy(lambda: np.round(policies, 2)))
+
+    # booster considering transfer actions are discarded
+    # the boosters are added one after another to keep the rounding of the float32 policies
+    positions = [tuple(unit.pos) for unit in units]
+    boosters = [np.array([(x,y) in game_state.wood_exist_xy_set for x,y in positions]) * 0.25]
+
+    if game_state.player.researched_coal_projected():
+        boosters.append(np.array([(x,y) in game_state.coal_exist_xy_set for x,y in positions]) * 0.75)
+
+    if game_state.player.researched_uranium():
+        boosters.append(np.array([game_state.convolved_uranium_exist_matrix[y,x] for x,y in positions]))
+
+    if game_state.player.researched_uranium_projected():
+        boosters.append(np.array([(x,y) in game_state.uranium_exist_xy_set for x,y in positions]) * 1.25)
+
+    for booster in boosters:
+        policies[:, :, -1] += booster[:, None].astype(np.float32)
+
+    average_policies = np.zeros((len(units), 6))
+    for i in range(NUMBER_OF_TRANSFORMS):
+        average_policies += policies[:, i]/NUMBER_OF_TRANSFORMS
+    ranked_policies = policies.argsort(axis=2).argsort(axis=2).sum(axis=1)
+
+    actions = []
+    for unit, average_policy, ranked_policy in zip(units, average_policies, ranked_policies):
+        print(ranked_policy)
+        print(average_policy)
+
+        action, pos, annotations = get_action(average_policy, game_state, unit, dest, DEBUG=DEBUG, use_probabilistic_sort=use_probabilistic_sort)
+        if tuple(pos):
+            dest.add(tuple(pos))
+        print(unit.id, unit.pos, pos, action, time.time() - start_time)
+        print()
+
+        actions.append(action)
+        actions.extend(annotations)
+
+    return actions
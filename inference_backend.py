@@ -0,0 +1,85 @@
+import glob
+import os
+import pickle
+import sys
+
+import numpy as np
+import torch
+
+
+class InferenceBackend:
+    # wraps the torchscript model for inference on cpu
+
+    def __init__(self, model_path: str, freeze=True, num_threads=None, quantize=False):
+        if num_threads:
+            # intra-op threads, the agent usually shares the machine with the opponent
+            torch.set_num_threads(num_threads)
+
+        model = torch.jit.load(model_path)
+        model.eval()
+
+        # dynamic quantization only replaces linear layers, for this model that is the policy head
+        # for a scripted module it may not apply at all, in which case the fp32 model is kept
+        self.quantized = False
+        if quantize:
+            quantized_model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            if "quantized" in str(quantized_model.inlined_graph):
+                model = quantized_model
+                self.quantized = True
+
+        # freezing inlines the parameters and folds the batch norms into the convolutions
+        self.frozen = freeze
+        if freeze:
+            model = torch.jit.optimize_for_inference(torch.jit.freeze(model))
+
+        self.model = model
+
+    def __call__(self, states: np.ndarray) -> np.ndarray:
+        with torch.inference_mode():
+            return self.model(torch.from_numpy(states)).numpy()
+
+
+def load_observations(snapshot_dir: str):
+    # observations from the game archives, and from the pickles written by older versions of the agent
+    from snapshot_archive import SnapshotArchive
+
+    for filename in sorted(glob.glob(os.path.join(snapshot_dir, "*.lxa"))):
+        archive = SnapshotArchive(filename)
+        for step in archive.steps():
+            yield archive.load_observation(step)
+    for filename in sorted(glob.glob(os.path.join(snapshot_dir, "observation-*.pkl"))):
+        with open(filename, 'rb') as handle:
+            yield pickle.load(handle)
+
+
+def check_agreement(model_path: str, snapshot_dir: str, **kwargs):
+    # compare the argmax of the backend against the fp32 model on the recorded observations
+    from lux.game_records import parse_updates
+    from imitation_agent import make_inputs, apply_transforms
+
+    reference = InferenceBackend(model_path, freeze=False)
+    backend = InferenceBackend(model_path, **kwargs)
+
+    agree, total, max_difference = 0, 0, 0.
+    for observation in load_observations(snapshot_dir):
+        records = parse_updates(observation["updates"])
+        unit_ids = [unit_id for unit_id, team in zip(records.unit_ids, records.units['team']) if team == observation["player"]]
+        if not unit_ids:
+            continue
+        states = apply_transforms(make_inputs(observation, unit_ids, records), 8)
+        expected, actual = reference(states), backend(states)
+        agree += int(np.sum(expected.argmax(axis=1) == actual.argmax(axis=1)))
+        total += len(states)
+        max_difference = max(max_difference, float(np.abs(expected - actual).max()))
+
+    return agree, total, max_difference, backend
+
+
+if __name__ == "__main__":
+    # python inference_backend.py [snapshot_dir]
+    path = os.path.dirname(os.path.realpath(__file__))
+    snapshot_dir = sys.argv[1] if len(sys.argv) > 1 else f'{path}/snapshots'
+    for kwargs in [dict(freeze=True), dict(freeze=True, quantize=True)]:
+        agree, total, max_difference, backend = check_agreement(f'{path}/model.pth', snapshot_dir, **kwargs)
+        print(kwargs, "quantized" if backend.quantized else "not quantized",
+              "argmax agreement {}/{}".format(agree, total), "max logit difference {:.5f}".format(max_difference))
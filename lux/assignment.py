@@ -0,0 +1,44 @@
+import numpy as np
+
+
+def min_cost_assignment(cost: np.ndarray) -> np.ndarray:
+    # column assigned to each row of the (n, m) cost matrix with n <= m, so that the total cost is the smallest
+    # hungarian algorithm with potentials, a row is added at a time along the shortest augmenting path
+    # the columns are scanned together, so a row takes O(n m) numpy operations over O(n) python steps
+    n, m = cost.shape
+    row_potential = np.zeros(n + 1)
+    column_potential = np.zeros(m + 1)
+    row_of_column = np.zeros(m + 1, dtype=int)  # 1-based row matched to each column, 0 if none, column 0 is the row being added
+    previous_column = np.zeros(m + 1, dtype=int)
+
+    for row in range(1, n + 1):
+        row_of_column[0] = row
+        column = 0
+        slack = np.full(m + 1, np.inf)
+        visited = np.zeros(m + 1, dtype=bool)
+        while row_of_column[column] != 0:
+            visited[column] = True
+            current_row = row_of_column[column]
+            reduced = cost[current_row - 1] - row_potential[current_row] - column_potential[1:]
+            improved = ~visited[1:] & (reduced < slack[1:])
+            slack[1:][improved] = reduced[improved]
+            previous_column[1:][improved] = column
+
+            # the closest column that is not visited
+            candidates = np.where(visited[1:], np.inf, slack[1:])
+            next_column = int(np.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+            row_potential[row_of_column[visited]] += delta
+            column_potential[visited] -= delta
+            slack[1:][~visited[1:]] -= delta
+            column = next_column
+
+        # flip the matches along the augmenting path
+        while column != 0:
+            row_of_column[column] = row_of_column[previous_column[column]]
+            column = previous_column[column]
+
+    assignment = np.full(n, -1)
+    matched = np.nonzero(row_of_column[1:])[0]
+    assignment[row_of_column[1:][matched] - 1] = matched
+    return assignment
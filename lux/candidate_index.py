@@ -0,0 +1,23 @@
+from typing import Tuple
+
+import numpy as np
+
+
+class CandidateIndex:
+    # the true tiles of a mask, sorted by row and then by column
+    # the tiles of each row are a contiguous slice, so the tiles near a position are found without scanning the map
+
+    def __init__(self, mask: np.ndarray):
+        self.height, self.width = mask.shape
+        self.ys, self.xs = np.nonzero(mask)
+        self.row_starts = np.searchsorted(self.ys, np.arange(self.height + 1))
+
+    def within(self, x: int, y: int, radius: int) -> Tuple[np.ndarray, np.ndarray]:
+        # the tiles at a manhattan distance of at most radius from (x,y), in the same order
+        if radius < 0:
+            return self.ys[:0], self.xs[:0]
+        start = self.row_starts[max(0, y - radius)]
+        end = self.row_starts[min(self.height, y + radius + 1)]
+        ys, xs = self.ys[start:end], self.xs[start:end]
+        near = abs(xs - x) + abs(ys - y) <= radius
+        return ys[near], xs[near]
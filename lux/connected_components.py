@@ -0,0 +1,50 @@
+from typing import List, Tuple
+
+import numpy as np
+
+
+def offset_slices(dy: int, dx: int, height: int, width: int) -> Tuple[Tuple[slice, slice], Tuple[slice, slice]]:
+    # slices of the cells p and of the cells p + (dy,dx), for the cells where both are on the map
+    def axis(d, size):
+        return slice(max(0, -d), size - max(0, d)), slice(max(0, d), size - max(0, -d))
+    (py, qy), (px, qx) = axis(dy, height), axis(dx, width)
+    return (py, px), (qy, qx)
+
+
+def propagate_labels(labels: np.ndarray, edges: List[Tuple[Tuple[int, int], np.ndarray]]) -> np.ndarray:
+    # labels are flat cell indices, or labels.size for cells that do not take part
+    # edges are the offset (dy,dx) with the mask of the cells p that are connected to p + (dy,dx)
+    # every cell ends up with the smallest label of its component
+    height, width = labels.shape
+    edge_slices = [(offset_slices(dy, dx, height, width), edge) for (dy, dx), edge in edges]
+    while True:
+        # take the smallest label of the neighbours, then jump to the label of the label
+        previous = labels.copy()
+        for (p, q), edge in edge_slices:
+            connected = edge[p]
+            labels[p] = np.where(connected, np.minimum(labels[p], previous[q]), labels[p])
+            labels[q] = np.where(connected, np.minimum(labels[q], previous[p]), labels[q])
+        taking_part = labels < labels.size
+        labels[taking_part] = labels.ravel()[labels[taking_part]]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def label_components(free: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # 4-connected components of the true cells of the (height, width) mask
+    # the label of a cell is the flat index of the first cell of its component, -1 if the cell is not free
+    # the sizes are indexed by the label
+    height, width = free.shape
+    labels = np.where(free, np.arange(height * width).reshape(height, width), height * width)
+
+    edges = []
+    for dy, dx in [(0,1), (1,0)]:
+        p, q = offset_slices(dy, dx, height, width)
+        edge = np.zeros_like(free)
+        edge[p] = free[p] & free[q]
+        edges.append(((dy, dx), edge))
+    labels = propagate_labels(labels, edges)
+
+    labels[~free] = -1
+    sizes = np.bincount(labels[free], minlength=height * width)
+    return labels, sizes
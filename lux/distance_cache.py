@@ -0,0 +1,146 @@
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .shortest_paths import UNREACHED, astar_distances, batched_distances, dial_distances, relax_distances
+
+versions = itertools.count()
+
+
+class VersionedSet(set):
+    # set that takes a new version whenever it is modified, the versions are unique across sets
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.version = next(versions)
+
+    def add(self, element):
+        super().add(element)
+        self.version = next(versions)
+
+    def discard(self, element):
+        super().discard(element)
+        self.version = next(versions)
+
+    def remove(self, element):
+        super().remove(element)
+        self.version = next(versions)
+
+    def pop(self):
+        self.version = next(versions)
+        return super().pop()
+
+    def clear(self):
+        super().clear()
+        self.version = next(versions)
+
+    def update(self, *others):
+        super().update(*others)
+        self.version = next(versions)
+
+    def difference_update(self, *others):
+        super().difference_update(*others)
+        self.version = next(versions)
+
+    def intersection_update(self, *others):
+        super().intersection_update(*others)
+        self.version = next(versions)
+
+    def symmetric_difference_update(self, other):
+        super().symmetric_difference_update(other)
+        self.version = next(versions)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+
+def is_consistent(distances: np.ndarray, cost: np.ndarray, cells: Tuple[np.ndarray, np.ndarray], sx: int, sy: int) -> bool:
+    # whether the distance of each of the cells is the smallest distance of its neighbours plus its cost
+    # a field that was exact for the previous costs is still exact if this holds at every cell whose cost changed
+    padded = np.pad(distances.astype(np.int32), 1, constant_values=UNREACHED)
+    ys, xs = cells[0] + 1, cells[1] + 1
+    through_neighbour = np.minimum(np.minimum(padded[ys-1,xs], padded[ys+1,xs]), np.minimum(padded[ys,xs-1], padded[ys,xs+1]))
+    consistent = (distances[cells] == through_neighbour + cost[cells]) | ((cells[0] == sy) & (cells[1] == sx))
+    return bool(np.all(consistent))
+
+
+class DistanceCache:
+    # exact distance fields to targets, kept across turns
+    # each field remembers the edge costs it was computed with, and is checked against the current costs when read
+    # it is only recomputed if one of the changed costs affects it
+
+    def __init__(self):
+        self.edge_cost: Optional[np.ndarray] = None
+        self.edge_cost_version = None
+        self.fields: Dict[Tuple, Tuple[np.ndarray, np.ndarray]] = {}  # target -> field, edge cost of the field
+        self.point_distances: Dict[Tuple, int] = {}  # (sx,sy,ex,ey) -> distance, for the current edge costs
+
+    def __getstate__(self):
+        # the fields are not pickled with the game state, they are computed again when needed
+        state = self.__dict__.copy()
+        state["fields"] = {}
+        state["point_distances"] = {}
+        return state
+
+    def set_edge_cost(self, edge_cost: np.ndarray, version):
+        if self.edge_cost is not None and np.array_equal(edge_cost, self.edge_cost):
+            self.edge_cost_version = version
+            return
+        self.edge_cost = edge_cost
+        self.edge_cost_version = version
+        self.point_distances = {}
+
+    def get_field(self, ex, ey) -> Optional[np.ndarray]:
+        if (ex,ey) not in self.fields:
+            return None
+        distances, edge_cost = self.fields[ex,ey]
+        if edge_cost is not self.edge_cost:
+            changed = np.nonzero(edge_cost != self.edge_cost)
+            if not is_consistent(distances, self.edge_cost, changed, ex, ey):
+                if np.all(self.edge_cost[changed] <= edge_cost[changed]):
+                    # the previous field is an upper bound of the distances
+                    distances = relax_distances(distances[None].astype(np.int32), self.edge_cost)[0]
+                else:
+                    distances = dial_distances(self.edge_cost, ex, ey)
+            self.fields[ex,ey] = distances, self.edge_cost
+        return distances
+
+    def compute_field(self, ex, ey) -> np.ndarray:
+        distances = self.get_field(ex, ey)
+        if distances is None:
+            distances = dial_distances(self.edge_cost, ex, ey)
+            self.fields[ex,ey] = distances, self.edge_cost
+        return distances
+
+    def compute_fields(self, positions: List[Tuple]):
+        # the fields that are missing are computed together
+        missing = [(ex,ey) for ex,ey in positions if self.get_field(ex, ey) is None]
+        if missing:
+            for (ex,ey), distances in zip(missing, batched_distances(self.edge_cost, missing)):
+                self.fields[ex,ey] = distances, self.edge_cost
+
+    def get_distances(self, sources: List[Tuple], ex, ey) -> List[int]:
+        # the field is read if there is one, otherwise a goal-directed search serves all the sources
+        distances = self.get_field(ex, ey)
+        if distances is not None:
+            return [int(distances[sy,sx]) for sx,sy in sources]
+
+        missing = [(sx,sy) for sx,sy in sources if (sx,sy,ex,ey) not in self.point_distances]
+        if missing:
+            for (sx,sy), distance in zip(missing, astar_distances(self.edge_cost, ex, ey, missing)):
+                self.point_distances[sx,sy,ex,ey] = distance
+        return [self.point_distances[sx,sy,ex,ey] for sx,sy in sources]
@@ -0,0 +1,19 @@
+import numpy as np
+
+
+def sweep(distances: np.ndarray):
+    # forward and backward pass along the second axis, in place
+    for i in range(1, distances.shape[1]):
+        np.minimum(distances[:,i], distances[:,i-1] + 1, out=distances[:,i])
+    for i in range(distances.shape[1] - 2, -1, -1):
+        np.minimum(distances[:,i], distances[:,i+1] + 1, out=distances[:,i])
+
+
+def manhattan_distance_transform(masks: np.ndarray, unreachable=99) -> np.ndarray:
+    # distance to the nearest true cell for each of the (height, width) masks, ignoring obstacles
+    # the manhattan distance separates, so the distance along y is swept first and then along x
+    # the distance is unreachable everywhere if the mask is empty
+    distances = np.where(masks, 0, unreachable)
+    sweep(distances)
+    sweep(distances.transpose(0,2,1))
+    return distances
@@ -1,20 +1,31 @@
-import heapq, time
-from collections import defaultdict, deque
+import math
+import time
+from collections import defaultdict
 from typing import DefaultDict, Dict, List, Tuple, Set
 from datetime import datetime
-import builtins as __builtin__
+from .log import get_logger
 from .game_position import Position
 
 import numpy as np
 
 from .constants import Constants
-from .game_map import GameMap, RESOURCE_TYPES
-from .game_objects import Player, Unit, City
+from .game_map import GameMap, RESOURCE_TYPES, RESOURCE_TYPE_CODES
+from .game_records import UpdateRecords, parse_updates
+from .distance_transform import manhattan_distance_transform
+from .candidate_index import CandidateIndex
+from .connected_components import label_components
+from .resource_clusters import ResourceClusters
+from .distance_cache import DistanceCache, VersionedSet
+from .inference_budget import InferenceBudget
+from .stage_timer import StageTimer
+from .game_objects import Player, Unit, City, CityTile
 from .game_position import Position
 from .game_constants import GAME_CONSTANTS
 
 INPUT_CONSTANTS = Constants.INPUT_CONSTANTS
 
+logger = get_logger("game")
+
 
 class Observation(Dict[str, any]):
     def __init__(self, player=0) -> None:
@@ -163,6 +174,7 @@ class Game:
 
     # counted from the time after the objects are saved to disk
     compute_start_time = -1
+    turn_time_limit = 3  # seconds
 
     def _initialize(self, messages):
         """
@@ -174,7 +186,6 @@ class Game:
         mapInfo = messages[1].split(" ")
         self.map_width: int = int(mapInfo[0])
         self.map_height: int = int(mapInfo[1])
-        self.map: GameMap = GameMap(self.map_width, self.map_height)
         self.players: List[Player] = [Player(0), Player(1)]
 
         self.y_order_coefficient = 1
@@ -190,6 +201,19 @@ class Game:
         ]
         self.dirs_dxdy: List = [(0,-1), (1,0), (0,1), (-1,0), (0,0)]
         self.units_expected_to_act: Set[Tuple] = set()
+        self.inference_budget = InferenceBudget()
+        self.stage_timer = StageTimer()
+        self.xy_to_resource_group_id: ResourceClusters = ResourceClusters(self.map_width, self.map_height)
+        self.distance_cache = DistanceCache()
+        self._reset_world()
+
+
+    def _reset_world(self):
+        # objects carried over between turns and updated in place
+        self.map: GameMap = GameMap(self.map_width, self.map_height)
+        self.units_by_id_of_previous_turn: Dict[str, Unit] = {}
+        self.cities_by_id_of_previous_turn: Dict[str, City] = {}
+        self.citytiles_by_xy_of_previous_turn: Dict[Tuple, CityTile] = {}
 
 
     def fix_iteration_order(self):
@@ -241,13 +265,14 @@ class Game:
         self.opponent: Player = self.players[1 - self.player_id]
 
 
-    def _update(self, messages):
+    def _update(self, messages, incremental=True):
         """
         update state
+        with incremental, the objects from the previous turn are updated in place
         """
-        self.map = GameMap(self.map_width, self.map_height)
+        if not incremental:
+            self._reset_world()
         self.turn += 1
-        self._reset_player_states()
 
         # [TODO] Use constants here
         self.night_turns_left = (360 - self.turn)//40 * 10 + min(10, (360 - self.turn)%40)
@@ -260,60 +285,62 @@ class Game:
 
         self.is_day_time = self.turns_to_dawn == 0
 
-        for update in messages:
-            if update == "D_DONE":
-                break
-            strs = update.split(" ")
-            input_identifier = strs[0]
-
-            if input_identifier == INPUT_CONSTANTS.RESEARCH_POINTS:
-                team = int(strs[1])   # probably player_id
-                self.players[team].research_points = int(strs[2])
-
-            elif input_identifier == INPUT_CONSTANTS.RESOURCES:
-                r_type = strs[1]
-                x = int(strs[2])
-                y = int(strs[3])
-                amt = int(float(strs[4]))
-                self.map._setResource(r_type, x, y, amt)
-
-            elif input_identifier == INPUT_CONSTANTS.UNITS:
-                unittype = int(strs[1])
-                team = int(strs[2])
-                unitid = strs[3]
-                x = int(strs[4])
-                y = int(strs[5])
-                cooldown = float(strs[6])
-                wood = int(strs[7])
-                coal = int(strs[8])
-                uranium = int(strs[9])
+        # units and citytiles are placed on the map again from the updates
+        self.map._clearUnits()
+        self.map._clearCityTiles()
+        self._reset_player_states()
+
+        # the update lines are tokenized once, the records are kept for other consumers
+        records: UpdateRecords = parse_updates(messages)
+        self.update_records = records
+
+        units_by_id: Dict[str, Unit] = {}
+        cities_by_id: Dict[str, City] = {}
+        citytiles_by_xy: Dict[Tuple, CityTile] = {}
+
+        for team, research_points in enumerate(records.research_points.tolist()):
+            self.players[team].research_points = research_points
+
+        for unitid, (unittype, team, x, y, cooldown, wood, coal, uranium) in zip(records.unit_ids, records.units.tolist()):
+            unit = self.units_by_id_of_previous_turn.get(unitid)
+            if unit:
+                unit._update(x, y, cooldown, wood, coal, uranium)
+            else:
                 unit = Unit(team, unittype, unitid, x, y, cooldown, wood, coal, uranium)
-                self.players[team].units.append(unit)
-                self.map.get_cell(x, y).unit = unit
-
-            elif input_identifier == INPUT_CONSTANTS.CITY:
-                team = int(strs[1])
-                cityid = strs[2]
-                fuel = float(strs[3])
-                lightupkeep = float(strs[4])
-                self.players[team].cities[cityid] = City(team, cityid, fuel, lightupkeep, self.night_turns_left)
-
-            elif input_identifier == INPUT_CONSTANTS.CITY_TILES:
-                team = int(strs[1])
-                cityid = strs[2]
-                x = int(strs[3])
-                y = int(strs[4])
-                cooldown = float(strs[5])
-                city = self.players[team].cities[cityid]
+            units_by_id[unitid] = unit
+            self.players[team].units.append(unit)
+            self.map._setUnit(x, y, unit)
+
+        for cityid, (team, fuel, lightupkeep) in zip(records.city_ids, records.cities.tolist()):
+            city = self.cities_by_id_of_previous_turn.get(cityid)
+            if city:
+                city._update(fuel, lightupkeep, self.night_turns_left)
+            else:
+                city = City(team, cityid, fuel, lightupkeep, self.night_turns_left)
+            cities_by_id[cityid] = city
+            self.players[team].cities[cityid] = city
+
+        for team, city_index, x, y, cooldown in records.citytiles.tolist():
+            cityid = records.city_ids[city_index]
+            city = self.players[team].cities[cityid]
+            citytile = self.citytiles_by_xy_of_previous_turn.get((x,y))
+            if citytile and citytile.cityid == cityid and citytile.team == team:
+                citytile.cooldown = cooldown
+                city.citytiles.append(citytile)
+            else:
+                # new citytile, or the cities have merged
                 citytile = city._add_city_tile(x, y, cooldown)
-                self.map.get_cell(x, y).citytile = citytile
-                self.players[team].city_tile_count += 1
+            citytiles_by_xy[x,y] = citytile
+            self.map._setCityTile(x, y, citytile)
+            self.players[team].city_tile_count += 1
+
+        # resources and roads are written into the planes as a whole
+        self.map._setResources(records.resources)
+        self.map._setRoads(records.roads)
 
-            elif input_identifier == INPUT_CONSTANTS.ROADS:
-                x = int(strs[1])
-                y = int(strs[2])
-                road = float(strs[3])
-                self.map.get_cell(x, y).road = road
+        self.units_by_id_of_previous_turn = units_by_id
+        self.cities_by_id_of_previous_turn = cities_by_id
+        self.citytiles_by_xy_of_previous_turn = citytiles_by_xy
 
         # create indexes to refer to unit by id
         self.player.make_index_units_by_id()
@@ -354,10 +381,18 @@ class Game:
         self.uranium_collection_rate = GAME_CONSTANTS["PARAMETERS"]["WORKER_COLLECTION_RATE"][RESOURCE_TYPES.URANIUM.upper()]
 
         # update matrices
-        self.calculate_matrix()
-        self.calculate_resource_matrix()
-        self.calculate_resource_groups()
-        self.calculate_distance_matrix()
+        with self.stage_timer.time("calculate_matrix"):
+            self.calculate_matrix()
+        with self.stage_timer.time("calculate_resource_matrix"):
+            self.calculate_resource_matrix()
+        with self.stage_timer.time("calculate_resource_groups"):
+            self.calculate_resource_groups()
+        with self.stage_timer.time("calculate_distance_matrix"):
+            self.calculate_distance_matrix()
+        with self.stage_timer.time("precompute_distance_fields"):
+            self.precompute_distance_fields(missions)
+        with self.stage_timer.time("calculate_target_matrices"):
+            self.calculate_target_matrices()
 
         # when to use rules
         for unit in self.player.units:
@@ -420,12 +455,11 @@ class Game:
             city_beside_coal = False
             city_beside_uranium = False
 
-        # 1 transform 10 ms
-        # 4 transform 25 ms
-        # 8 transform 45 ms
-
-        allowed_transforms = 1500//5
-        self.number_of_transforms = max(1, min(8, allowed_transforms//self.player_unit_can_act_count))
+        # the number of transforms is chosen from the measured inference latency and the time left in the turn
+        time_left = None
+        if self.compute_start_time > 0:
+            time_left = (self.turn_time_limit - (time.time() - self.compute_start_time)) * 1000
+        self.number_of_transforms = self.inference_budget.number_of_transforms(self.player_unit_can_act_count, time_left)
 
         # # gating
         # for unit in self.player.units:
@@ -521,46 +555,30 @@ class Game:
         self.probably_buildable_tile_matrix = self.init_matrix()
         self.preferred_buildable_tile_matrix = self.init_matrix()
 
-        self.road_level_matrix = self.init_matrix()
+        game_map = self.map
+        has_resource = (game_map.resource_type > 0) & (game_map.resource_amount > 0)
+        has_citytile = game_map.citytile_team >= 0
+        has_unit = game_map.unit_count > 0
 
-        for y in self.y_iteration_order:
-            for x in self.x_iteration_order:
-                cell = self.map.get_cell(x, y)
-
-                self.road_level_matrix[y,x] = cell.road
-
-                is_empty = True
-                is_buildable = True
-
-                if cell.unit:
-                    is_empty = False
-                    # unit counting method implemented later
-                    # cell.unit only contain one unit even though multiple units can stay in citytile
-
-                if cell.has_resource():
-                    is_empty = False
-                    is_buildable = False
-                    if cell.resource.type == RESOURCE_TYPES.WOOD:
-                        self.wood_amount_matrix[y,x] += cell.resource.amount
-                    if cell.resource.type == RESOURCE_TYPES.COAL:
-                        self.coal_amount_matrix[y,x] += cell.resource.amount
-                    if cell.resource.type == RESOURCE_TYPES.URANIUM:
-                        self.uranium_amount_matrix[y,x] += cell.resource.amount
-                    self.all_resource_amount_matrix[y,x] += cell.resource.amount
-
-                elif cell.citytile:
-                    is_empty = False
-                    is_buildable = False
-                    if cell.citytile.team == self.player_id:
-                        self.player_city_tile_matrix[y,x] += 1
-                    else:   # city tile belongs to opponent
-                        self.opponent_city_tile_matrix[y,x] += 1
-
-                if is_empty:
-                    self.empty_tile_matrix[y,x] += 1
-
-                if is_buildable:
-                    self.buildable_tile_matrix[y,x] += 1
+        self.road_level_matrix = game_map.road.astype(int)
+
+        for r_type, matrix in [
+            [RESOURCE_TYPES.WOOD,       self.wood_amount_matrix],
+            [RESOURCE_TYPES.COAL,       self.coal_amount_matrix],
+            [RESOURCE_TYPES.URANIUM,    self.uranium_amount_matrix]]:
+            is_type = has_resource & (game_map.resource_type == RESOURCE_TYPE_CODES[r_type])
+            matrix[is_type] = game_map.resource_amount[is_type]
+        self.all_resource_amount_matrix[has_resource] = game_map.resource_amount[has_resource]
+
+        # citytiles are only counted if there is no resource on the tile
+        is_citytile = has_citytile & ~has_resource
+        self.player_city_tile_matrix[is_citytile & (game_map.citytile_team == self.player_id)] = 1
+        self.opponent_city_tile_matrix[is_citytile & (game_map.citytile_team != self.player_id)] = 1
+
+        # unit counting method implemented later
+        # the map only contain one unit even though multiple units can stay in citytile
+        self.empty_tile_matrix[~has_unit & ~has_resource & ~has_citytile] = 1
+        self.buildable_tile_matrix[~has_resource & ~has_citytile] = 1
 
         for unit in self.player.units:
             self.player_units_matrix[unit.pos.y,unit.pos.x] += 1
@@ -595,38 +613,54 @@ class Game:
         self.map_resource_count = np.sum(self.wood_amount_matrix + self.coal_amount_matrix + self.uranium_amount_matrix)
 
 
+    def mask_from_set(self, set_object):
+        # boolean matrix of the positions in the set, positions out of the map are ignored
+        mask = np.zeros((self.map_height, self.map_width), dtype=bool)
+        if set_object:
+            xs, ys = np.array(list(set_object)).T
+            inside = (0 <= xs) & (xs < self.map_width) & (0 <= ys) & (ys < self.map_height)
+            mask[ys[inside], xs[inside]] = True
+        return mask
+
+
     def get_floodfill(self, set_object):
         # return the largest connected graph ignoring blockers
-        ds = DisjointSet()
-        for y in self.y_iteration_order:
-            for x in self.x_iteration_order:
-                if (x,y) in set_object:
-                    continue
-                for dy,dx in self.dirs_dxdy[:-1]:
-                    xx, yy = x+dx, y+dy
-                    if (xx,yy) in self.xy_out_of_map:
-                        continue
-                    if (xx,yy) in set_object:
-                        continue
-                    ds.union((x,y), (xx,yy))
+        free = ~self.mask_from_set(set_object)
+        labels, sizes = label_components(free)
 
-        floodfills = sorted(ds.get_groups().values(), key=len, reverse=True)
+        # components are ranked by size, then by their first tile in the iteration order
+        # isolated tiles are not part of any component
+        scan_rank = self.iteration_rank()
+        first_rank = np.full(len(sizes), self.map_height * self.map_width)
+        np.minimum.at(first_rank, labels[free], scan_rank[free])
+        components = np.nonzero(sizes > 1)[0]
+        components = components[np.lexsort((first_rank[components], -sizes[components]))]
 
         # for smaller maps, resources may divide the map into two
+        covered = np.cumsum(sizes[components])
+        enough = np.nonzero(covered > self.map_width * self.map_height * 0.7 - len(self.occupied_xy_set))[0]
+        if len(enough):
+            components = components[:enough[0] + 1]
+
         all_floodfill = set()
-        for floodfill in floodfills:
-            all_floodfill.update(floodfill)
-            if len(all_floodfill) > self.map_width * self.map_height * 0.7 - len(self.occupied_xy_set):
-                return all_floodfill
+        self.populate_set(free & np.isin(labels, components), all_floodfill)
         return all_floodfill
 
 
+    def iteration_rank(self):
+        # position of each tile when iterating over y_iteration_order then x_iteration_order
+        rank = self.init_matrix()
+        rank[np.ix_(self.y_iteration_order, self.x_iteration_order)] = \
+            np.arange(self.map_height * self.map_width).reshape(self.map_height, self.map_width)
+        return rank
+
+
     def populate_set(self, matrix, set_object):
         # modifies the set_object in place and add nonzero items in the matrix
-        for y in self.y_iteration_order:
-            for x in self.x_iteration_order:
-                if matrix[y,x] > 0:
-                    set_object.add((x,y))
+        # items are added in the iteration order
+        yi, xi = np.nonzero(matrix[np.ix_(self.y_iteration_order, self.x_iteration_order)] > 0)
+        set_object.update(zip(np.array(self.x_iteration_order)[xi].tolist(),
+                              np.array(self.y_iteration_order)[yi].tolist()))
 
 
     def convert_into_sets(self):
@@ -687,9 +721,10 @@ class Game:
         # occupied by enemy units or city - yes
         # occupied by self unit not in city - yes
         # occupied by self city - no (even if there are units)
-        self.occupied_xy_set = (self.player_units_xy_set | self.opponent_units_xy_set | \
-                                self.opponent_city_tile_xy_set | self.xy_out_of_map) \
-                                - self.player_city_tile_xy_set - self.opponent_units_moveable_xy_set
+        # versioned so that the exact distances can tell when the occupied tiles changed
+        self.occupied_xy_set = VersionedSet((self.player_units_xy_set | self.opponent_units_xy_set | \
+                                             self.opponent_city_tile_xy_set | self.xy_out_of_map) \
+                                            - self.player_city_tile_xy_set - self.opponent_units_moveable_xy_set)
 
         self.floodfill_by_player_city_set = self.get_floodfill(self.player_city_tile_xy_set)
         self.floodfill_by_opponent_city_set = self.get_floodfill(self.opponent_city_tile_xy_set)
@@ -708,27 +743,10 @@ class Game:
                 x_distance_from_edge = min(x, self.map_height-x-1)
                 self.distance_from_edge[y,x] = y_distance_from_edge + x_distance_from_edge
 
-        def calculate_distance_from_set(relevant_set):
-            visited = set()
-            matrix = self.init_matrix(default_value=99)
-            for y in self.y_iteration_order:
-                for x in self.x_iteration_order:
-                    if (x,y) in relevant_set:
-                        visited.add((x,y))
-                        matrix[y,x] = 0
-
-            queue = deque(list(visited))
-            while queue:
-                x,y = queue.popleft()
-                for dx,dy in self.dirs_dxdy[:-1]:
-                    xx, yy = x+dx, y+dy
-                    if (xx,yy) in visited:
-                        continue
-                    if 0 <= xx < self.map_width and 0 <= yy < self.map_height:
-                        matrix[yy,xx] = matrix[y,x] + 1
-                        queue.append((xx,yy))
-                        visited.add((xx,yy))
-            return matrix
+        def calculate_distance_from_sets(relevant_sets):
+            # unobstructed distance from each set, computed together on the stacked masks
+            masks = np.stack([self.mask_from_set(relevant_set) for relevant_set in relevant_sets])
+            return list(manhattan_distance_transform(masks))
 
 
         def get_median(arr):
@@ -771,29 +789,43 @@ class Game:
             return matrix, Position(int(mx), int(my))
 
         # calculate distance from resource (with projected research requirements)
-        self.distance_from_collectable_resource = calculate_distance_from_set(self.collectable_tiles_xy_set)
-        self.distance_from_collectable_resource_projected = calculate_distance_from_set(self.collectable_tiles_projected_xy_set)
-
         # calculate distance from citytiles or units
-        self.distance_from_player_assets = calculate_distance_from_set(self.player_units_xy_set | self.player_city_tile_xy_set)
-        self.distance_from_opponent_assets = calculate_distance_from_set(self.opponent_units_xy_set | self.opponent_city_tile_xy_set)
-        self.distance_from_player_units = calculate_distance_from_set(self.player_units_xy_set)
-        self.distance_from_opponent_units = calculate_distance_from_set(self.opponent_units_xy_set)
-        self.distance_from_player_citytiles = calculate_distance_from_set(self.player_city_tile_xy_set)
-        self.distance_from_opponent_citytiles = calculate_distance_from_set(self.opponent_city_tile_xy_set)
-
-        self.distance_from_buildable_tile = calculate_distance_from_set(self.buildable_tile_xy_set)
-        self.distance_from_empty_tile = calculate_distance_from_set(self.empty_tile_xy_set)
-        self.distance_from_wood_tile = calculate_distance_from_set(self.wood_exist_xy_set)
-
-        self.distance_from_floodfill_by_player_city = calculate_distance_from_set(self.floodfill_by_player_city_set)
-        self.distance_from_floodfill_by_opponent_city = calculate_distance_from_set(self.floodfill_by_opponent_city_set)
-        self.distance_from_floodfill_by_either_city = calculate_distance_from_set(self.floodfill_by_either_city_set)
-        self.distance_from_floodfill_by_empty_tile = calculate_distance_from_set(self.floodfill_by_empty_tile_set)
+        (self.distance_from_collectable_resource,
+         self.distance_from_collectable_resource_projected,
+         self.distance_from_player_assets,
+         self.distance_from_opponent_assets,
+         self.distance_from_player_units,
+         self.distance_from_opponent_units,
+         self.distance_from_player_citytiles,
+         self.distance_from_opponent_citytiles,
+         self.distance_from_buildable_tile,
+         self.distance_from_empty_tile,
+         self.distance_from_wood_tile,
+         self.distance_from_floodfill_by_player_city,
+         self.distance_from_floodfill_by_opponent_city,
+         self.distance_from_floodfill_by_either_city,
+         self.distance_from_floodfill_by_empty_tile,
+         self.distance_from_preferred_buildable,
+         self.distance_from_probably_buildable) = calculate_distance_from_sets([
+            self.collectable_tiles_xy_set,
+            self.collectable_tiles_projected_xy_set,
+            self.player_units_xy_set | self.player_city_tile_xy_set,
+            self.opponent_units_xy_set | self.opponent_city_tile_xy_set,
+            self.player_units_xy_set,
+            self.opponent_units_xy_set,
+            self.player_city_tile_xy_set,
+            self.opponent_city_tile_xy_set,
+            self.buildable_tile_xy_set,
+            self.empty_tile_xy_set,
+            self.wood_exist_xy_set,
+            self.floodfill_by_player_city_set,
+            self.floodfill_by_opponent_city_set,
+            self.floodfill_by_either_city_set,
+            self.floodfill_by_empty_tile_set,
+            self.preferred_buildable_tile_xy_set,
+            self.probably_buildable_tile_xy_set])
         if self.turn <= 20:
-            self.distance_from_floodfill_by_empty_tile = calculate_distance_from_set(self.buildable_tile_xy_set)
-        self.distance_from_preferred_buildable = calculate_distance_from_set(self.preferred_buildable_tile_xy_set)
-        self.distance_from_probably_buildable = calculate_distance_from_set(self.probably_buildable_tile_xy_set)
+            self.distance_from_floodfill_by_empty_tile = self.distance_from_buildable_tile.copy()
 
         self.distance_from_resource_mean, self.resource_mean = calculate_distance_from_mean(self.collectable_tiles_xy_set)
         self.distance_from_resource_median, self.resource_median = calculate_distance_from_median(self.collectable_tiles_xy_set)
@@ -810,70 +842,112 @@ class Game:
         self.opponent_unit_adjacent_and_buildable_xy_set: Set = self.opponent_unit_adjacent_xy_set & self.buildable_tile_xy_set
         self.opponent_unit_adjacent_and_player_city_xy_set: Set = self.opponent_unit_adjacent_xy_set & self.player_city_tile_xy_set
 
-        # standardised distance from self
-        for x,y in self.convolved_collectable_tiles_xy_set:
-            leader = self.xy_to_resource_group_id.find((x,y),)
-            self.xy_to_resource_group_id.dist_from_player[leader] = min(self.xy_to_resource_group_id.get_dist_from_player((x,y),),
-                                                                        self.distance_from_player_assets[y,x])
+        # standardised distance from self and from opponent
+        self.xy_to_resource_group_id.set_distances(self.convolved_collectable_tiles_matrix > 0,
+                                                   self.distance_from_player_assets, self.distance_from_opponent_assets)
 
-        # standardised distance from opponent
-        for x,y in self.convolved_collectable_tiles_xy_set:
-            leader = self.xy_to_resource_group_id.find((x,y),)
-            self.xy_to_resource_group_id.dist_from_opponent[leader] = min(self.xy_to_resource_group_id.get_dist_from_opponent((x,y),),
-                                                                          self.distance_from_opponent_assets[y,x])
+        # cost of entering each tile, apart from the occupied tiles that can change during the turn
+        self.edge_cost_without_occupied = np.ones((self.map_height, self.map_width), dtype=np.int16)
+        self.edge_cost_without_occupied[self.mask_from_set(self.opponent_city_tile_xy_set)] = 50
+        self.edge_cost_without_occupied[self.matrix_player_cities_nights_of_fuel_required_for_game < 0] = 500
+        self.distance_cache.edge_cost_version = None
 
-        # calculating distances from every unit positions and its adjacent positions
-        # avoid blocked places as much as possible
-        self.positions_to_calculate_distances_from = set()
 
-        self.compute_distance_to_target_cache = {}
+    def precompute_distance_fields(self, missions: Missions):
+        # exact distance fields to the tiles that homing units move to, computed together at the start of the turn
+        # these are the targets of the homing missions and the citytiles of the cities that may not survive the night
+        self.positions_to_calculate_distances_from: Set = set()
+        for mission in missions.values():
+            if "homing" in mission.details:
+                self.positions_to_calculate_distances_from.add(tuple(mission.target_position))
+        for city in self.player.cities.values():
+            if city.night_fuel_duration < self.night_turns_left:
+                for citytile in city.citytiles:
+                    self.positions_to_calculate_distances_from.add(tuple(citytile.pos))
+
+        self.update_edge_cost()
+        self.distance_cache.compute_fields(sorted(self.positions_to_calculate_distances_from))
+
+
+    def calculate_target_matrices(self):
+        # terms of the target scores of find_best_cluster that do not depend on the unit
+        # the terms that depend on the targets of other units are computed when the targets are read
+        self.iteration_rank_matrix = self.iteration_rank()
+
+        # tiles that can be targeted, the other tiles are never scored
+        self.target_candidates = CandidateIndex(~self.mask_from_set(self.opponent_city_tile_xy_set) &
+                                                ~self.mask_from_set(self.player_city_tile_xy_set) &
+                                                (self.convolved_collectable_tiles_matrix_projected != 0))
+
+        # uranium mines can be targeted by more than one unit, once uranium is researched
+        self.shareable_target_matrix = (self.convolved_uranium_exist_matrix != 0) & \
+                                       (self.matrix_player_cities_nights_of_fuel_required_for_night > 0)
+
+        # second term of the score, without the bonus for mining advanced resources
+        self.target_preference_matrix = - self.distance_from_floodfill_by_empty_tile \
+                                        - (~self.mask_from_set(self.collectable_tiles_xy_set) &
+                                           ~self.mask_from_set(self.buildable_tile_xy_set))
+
+        # third term of the score, without the distance from the unit
+        self.target_position_matrix = - self.distance_from_resource_median - self.distance_from_opponent_assets \
+                                      + self.distance_from_player_unit_median
+        if self.turn < 80:
+            self.target_position_matrix -= 2 * (self.distance_from_opponent_assets + 1 == self.distance_from_player_units)
+        if self.turn < 1:
+            self.target_position_matrix -= 2 * ((self.distance_from_opponent_assets == 1) & (self.distance_from_player_assets > 2))
+
+        # tiles beside a single wood tile
+        self.single_wood_side_matrix = (self.convolved_wood_exist_matrix == 1) & (self.resource_collection_rate == 20) & \
+                                       (self.distance_from_opponent_units > 2)
+        # tiles where only wood is collected
+        self.wood_only_matrix = self.convolved_wood_exist_matrix*20 == self.resource_collection_rate
+
+        # cluster terms of the target bonus, read through the cluster of each tile
+        clusters = self.xy_to_resource_group_id
+        dist_from_player = clusters.dist_from_player[clusters.labels]
+        dist_from_opponent = clusters.dist_from_opponent[clusters.labels]
+        distinct_distances, inverse = np.unique(dist_from_player.ravel(), return_inverse=True)
+        self.travel_penalty_matrix = np.array([math.log(4 + distance, 2) for distance in distinct_distances.tolist()]
+                                              )[inverse].reshape(dist_from_player.shape)
+        # the tile is much closer to the enemy than the cluster is to the player
+        self.invasion_target_matrix = self.distance_from_opponent_assets + 5 < dist_from_player
+        # the cluster is closer to the enemy
+        self.contested_target_matrix = dist_from_opponent < dist_from_player
+
+
+    def update_edge_cost(self):
+        # the occupied tiles change as the units are moved during the turn
+        if self.distance_cache.edge_cost_version != self.occupied_xy_set.version:
+            edge_cost = self.edge_cost_without_occupied.copy()
+            edge_cost[self.mask_from_set(self.occupied_xy_set) & (edge_cost == 1)] = 10
+            self.distance_cache.set_edge_cost(edge_cost, self.occupied_xy_set.version)
 
 
     def compute_distance_to_target(self,sx,sy):
-        if (sx,sy) in self.compute_distance_to_target_cache:
-            return self.compute_distance_to_target_cache[sx,sy]
-
-        start_pos = (sx,sy)
-        xy_processed = set()
-        distance_to_target = {}
-
-        d4 = self.dirs_dxdy[:-1]
-        heap = [(0, start_pos),]
-        while heap:
-            curdist, (x,y) = heapq.heappop(heap)
-            if (x,y) in xy_processed:
-                continue
-            xy_processed.add((x,y),)
-            distance_to_target[x,y] = curdist
-
-            for dx,dy in d4:
-                xx,yy = x+dx,y+dy
-                if not (0 <= xx < self.map_width and 0 <= yy < self.map_height):
-                    continue
-                if (xx,yy) in xy_processed:
-                    continue
+        # matrix of the distance from every tile to (sx,sy), avoiding blocked tiles
+        self.update_edge_cost()
+        return self.distance_cache.compute_field(sx,sy)
 
-                edge_length = 1
-                if (xx,yy) in self.occupied_xy_set:
-                    edge_length = 10
-                if (xx,yy) in self.opponent_city_tile_xy_set:
-                    edge_length = 50
-                if self.matrix_player_cities_nights_of_fuel_required_for_game[yy,xx] < 0:
-                    edge_length = 500
 
-                heapq.heappush(heap, (curdist + edge_length, (xx,yy)))
-
-        self.compute_distance_to_target_cache[sx,sy] = distance_to_target
-        return distance_to_target
+    def retrieve_exact_distances(self, sources, ex, ey) -> List[int]:
+        # distances from each of the sources to (ex,ey), avoiding blocked tiles
+        # one goal-directed search serves all the sources, the full matrix is only read if it was already computed
+        self.update_edge_cost()
+        return self.distance_cache.get_distances(sources, ex, ey)
 
 
     def retrieve_distance(self, sx, sy, ex, ey, use_exact=False):
         if use_exact:
-            return self.compute_distance_to_target(ex, ey)[sx,sy]
+            return self.retrieve_exact_distances([(sx,sy)], ex, ey)[0]
 
         return abs(sx-ex) + abs(sy-ey)
 
 
+    def retrieve_distances(self, sx, sy, exs, eys):
+        # retrieve_distance from (sx,sy) to each of the tiles
+        return abs(exs-sx) + abs(eys-sy)
+
+
     def convolve(self, matrix):
         # each worker gets resources from (up to) five tiles
         new_matrix = matrix.copy()
@@ -968,74 +1042,11 @@ class Game:
         # compute join the resource cluster and calculate the amount of resource
         # clusters that are connected by a diagonal are considered to be a different resource
         # the cluster with more sources own more sides
-
-        # index individual resource tiles
-        self.xy_to_resource_group_id: DisjointSet = DisjointSet()
-        for y in self.y_iteration_order:
-            for x in self.x_iteration_order:
-                if (x,y) in self.convolved_collectable_tiles_projected_xy_set:
-                    if (x,y) in self.wood_exist_xy_set:
-                        self.xy_to_resource_group_id.find((x,y), point=1, tile=1)
-                    if (x,y) in self.coal_exist_xy_set:
-                        self.xy_to_resource_group_id.find((x,y), point=3, tile=1)
-                    if (x,y) in self.uranium_exist_xy_set:
-                        self.xy_to_resource_group_id.find((x,y), point=5, tile=1)
-                if (x,y) in self.convolved_collectable_tiles_projected_xy_set:
-                    if (x,y) in self.player_city_tile_xy_set:
-                        self.xy_to_resource_group_id.find((x,y), citytile=1)
-
-        # merge adjacent resource tiles and citytiles
-        for y in self.y_iteration_order:
-            for x in self.x_iteration_order:
-                if (x,y) in self.collectable_tiles_projected_xy_set:
-                    # if self.xy_to_resource_group_id.get_tiles((x,y)) > self.map_height/2:
-                    #     continue
-                    for dy,dx in self.dirs_dxdy[:-1]:
-                        xx, yy = x+dx, y+dy
-                        # if self.xy_to_resource_group_id.get_tiles((xx,yy)) > self.map_height/2:
-                        #     continue
-                        if 0 <= yy < self.map_height and 0 <= xx < self.map_width:
-                            if (xx,yy) in self.collectable_tiles_projected_xy_set:
-                                self.xy_to_resource_group_id.union((x,y), (xx,yy))
-                            if (xx,yy) in self.player_city_tile_xy_set:
-                                if self.xy_to_resource_group_id.get_tiles((xx,yy),) == 0:
-                                    self.xy_to_resource_group_id.union((x,y), (xx,yy))
-
-        # consider resources two steps away as part of the cluster
-        for y in self.y_iteration_order:
-            for x in self.x_iteration_order:
-                if (x,y) in self.collectable_tiles_projected_xy_set:
-                    for dy1,dx1 in self.dirs_dxdy[:-1]:
-                        for dy2,dx2 in self.dirs_dxdy[:-1]:
-                            xx, yy = x+dx1+dx2, y+dy1+dy2
-                            if 0 <= yy < self.map_height and 0 <= xx < self.map_width:
-                                # if (xx,yy) in self.collectable_tiles_projected_xy_set:
-                                #     if self.xy_to_resource_group_id.get_tiles((xx,yy)) <= 2:
-                                        self.xy_to_resource_group_id.union((x,y), (xx,yy))
-
-        # absorb adjacent citytiles
-        for group in self.xy_to_resource_group_id.get_groups_sorted_by_citytile_size():
-            # might break symmetry
-            for x,y in group:
-                if (x,y) in self.collectable_tiles_projected_xy_set:
-                    for dy,dx in self.dirs_dxdy[:-1]:
-                        xx, yy = x+dx, y+dy
-                        if 0 <= yy < self.map_height and 0 <= xx < self.map_width:
-                            if (xx,yy) not in self.player_city_tile_xy_set:
-                                if self.xy_to_resource_group_id.find((xx,yy)) == (xx,yy):
-                                    self.xy_to_resource_group_id.union((x,y), (xx,yy))
-
-        # absorb adjacent buildable tiles
-        for group in self.xy_to_resource_group_id.get_groups_sorted_by_citytile_size():
-            # might break symmetry
-            for x,y in group:
-                if (x,y) in self.collectable_tiles_projected_xy_set:
-                    for dy,dx in self.dirs_dxdy[:-1]:
-                        xx, yy = x+dx, y+dy
-                        if 0 <= yy < self.map_height and 0 <= xx < self.map_width:
-                            if (xx,yy) not in self.collectable_tiles_projected_xy_set:
-                                if self.xy_to_resource_group_id.find((xx,yy)) == (xx,yy):
-                                    self.xy_to_resource_group_id.union((x,y), (xx,yy))
+        # the clusters are kept across turns and only rebuilt where the tiles changed
+        self.xy_to_resource_group_id.update(self.collectable_tiles_matrix_projected > 0, self.player_city_tile_matrix > 0)
+        self.xy_to_resource_group_id.set_statistics(self.convolved_collectable_tiles_matrix_projected > 0,
+                                                    self.wood_exist_matrix, self.coal_exist_matrix, self.uranium_exist_matrix,
+                                                    self.player_city_tile_matrix)
 
 
     def repopulate_targets(self, missions: Missions):
@@ -1043,7 +1054,7 @@ class Game:
         # probably these attributes belong to missions, but left it here to avoid circular imports
         pos_list = missions.get_targets()
         self.targeted_leaders: Set = set(self.xy_to_resource_group_id.find(tuple(pos)) for pos in pos_list)
-        self.targeted_cluster_count = sum(self.xy_to_resource_group_id.get_point((x,y)) > 0 for x,y in self.targeted_leaders)
+        self.targeted_cluster_count = sum(self.xy_to_resource_group_id.get_leader_point(leader) > 0 for leader in self.targeted_leaders)
 
         self.targeted_xy_set: Set = set()
         for mission in missions.values():
@@ -1061,21 +1072,19 @@ class Game:
         self.targeted_for_building_xy_set: Set = \
             set(tuple(pos) for pos,action in pos_and_action_list if action and action[:5] == "bcity") - self.player_city_tile_xy_set
 
-        self.resource_leader_to_locating_units: DefaultDict[Tuple, Set[str]] = defaultdict(set)
+        self.resource_leader_to_locating_units: DefaultDict[int, Set[str]] = defaultdict(set)
         for unit_id in self.player.units_by_id:
             unit: Unit = self.player.units_by_id[unit_id]
             current_position = tuple(unit.pos)
             leader = self.xy_to_resource_group_id.find(current_position)
-            if leader:
-                self.resource_leader_to_locating_units[leader].add(unit_id)
+            self.resource_leader_to_locating_units[leader].add(unit_id)
 
-        self.resource_leader_to_targeting_units: DefaultDict[Tuple, Set[str]] = defaultdict(set)
+        self.resource_leader_to_targeting_units: DefaultDict[int, Set[str]] = defaultdict(set)
         for unit_id in missions:
             mission: Mission = missions[unit_id]
             target_position = tuple(mission.target_position)
             leader = self.xy_to_resource_group_id.find(target_position)
-            if leader:
-                self.resource_leader_to_targeting_units[leader].add(unit_id)
+            self.resource_leader_to_targeting_units[leader].add(unit_id)
 
 
     def find_nearest_city_requiring_fuel(self, unit: Unit, require_reachable=True,
@@ -1085,8 +1094,7 @@ class Game:
         # prefer_night - prefer refuelling a city that could not survive the night
         # enforce_night - only refuel city that could not survive the night
         # enforce_night_addn - only refuel city that could not survive the night + enforce_night_addn
-        if DEBUG: print = __builtin__.print
-        else: print = lambda *args: None
+        print = logger.printer(DEBUG)
 
         closest_distance_with_features: int = [0,10**9 + 7]
         closest_position = unit.pos
@@ -1165,8 +1173,7 @@ class Game:
 
 
 def cleanup_missions(game_state: Game, missions: Missions, DEBUG=False):
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+    print = logger.printer(DEBUG)
 
     for unit_id in list(missions.keys()):
         mission: Mission = missions[unit_id]
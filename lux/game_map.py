@@ -1,5 +1,7 @@
 import math, random
-from typing import List, Set, Tuple
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
 
 from .constants import Constants
 from .game_objects import CityTile, Unit
@@ -7,6 +9,14 @@ from .game_position import Position
 
 RESOURCE_TYPES = Constants.RESOURCE_TYPES
 
+# values stored in GameMap.resource_type, zero for no resource
+RESOURCE_TYPE_CODES: Dict[str, int] = {
+    RESOURCE_TYPES.WOOD: 1,
+    RESOURCE_TYPES.COAL: 2,
+    RESOURCE_TYPES.URANIUM: 3,
+}
+RESOURCE_TYPE_NAMES: List[str] = [None, RESOURCE_TYPES.WOOD, RESOURCE_TYPES.COAL, RESOURCE_TYPES.URANIUM]
+
 
 class Resource:
     def __init__(self, r_type: str, amount: int):
@@ -15,36 +25,62 @@ class Resource:
 
 
 class Cell:
-    def __init__(self, x, y):
+    # thin view into the planes of the GameMap, kept for compatibility
+    def __init__(self, game_map: 'GameMap', x, y):
+        self.game_map = game_map
         self.pos = Position(x, y)
-        self.resource: Resource = None
-        self.citytile: CityTile = None
-        self.unit: Unit = None  # may have multiple units
-        self.road = 0
+
+    @property
+    def resource(self) -> Resource:
+        r_type = self.game_map.resource_type[self.pos.y, self.pos.x]
+        if not r_type:
+            return None
+        return Resource(RESOURCE_TYPE_NAMES[r_type], int(self.game_map.resource_amount[self.pos.y, self.pos.x]))
+
+    @property
+    def citytile(self) -> CityTile:
+        return self.game_map.citytiles_by_xy.get((self.pos.x, self.pos.y))
+
+    @property
+    def unit(self) -> Unit:
+        # may have multiple units, this is the last unit in the updates
+        return self.game_map.units_by_xy.get((self.pos.x, self.pos.y))
+
+    @property
+    def road(self):
+        return self.game_map.road[self.pos.y, self.pos.x]
 
     def has_resource(self):
-        return self.resource is not None and self.resource.amount > 0
+        return self.game_map.resource_type[self.pos.y, self.pos.x] > 0 and self.game_map.resource_amount[self.pos.y, self.pos.x] > 0
 
 
 class GameMap:
     def __init__(self, width, height):
         self.height = height
         self.width = width
-        self.map: List[List[Cell]] = [None] * height
-        for y in range(0, self.height):
-            self.map[y] = [None] * width
-            for x in range(0, self.width):
-                self.map[y][x] = Cell(x, y)
+
+        # struct of arrays, indexed by [y,x]
+        self.resource_type = np.zeros((height, width), dtype=np.int8)
+        self.resource_amount = np.zeros((height, width), dtype=np.int32)
+        self.citytile_team = np.full((height, width), -1, dtype=np.int8)
+        self.citytile_city = np.full((height, width), -1, dtype=np.int16)  # index into self.cityids
+        self.road = np.zeros((height, width), dtype=np.float64)
+        self.unit_count = np.zeros((height, width), dtype=np.int16)
+
+        # objects that the planes refer to
+        self.cityids: List[str] = []
+        self.cityid_to_index: Dict[str, int] = {}
+        self.citytiles_by_xy: Dict[Tuple[int, int], CityTile] = {}
+        self.units_by_xy: Dict[Tuple[int, int], Unit] = {}
 
     def get_cell_by_pos(self, pos) -> Cell:
-        return self.map[pos.y][pos.x]
+        return Cell(self, pos.x, pos.y)
 
     def get_cell(self, x, y) -> Cell:
-        return self.map[y][x]
+        return Cell(self, x, y)
 
-    def get_cityid_of_cell(self, x, y) -> Cell:
-        cell: Cell = self.map[y][x]
-        citytile: CityTile = cell.citytile
+    def get_cityid_of_cell(self, x, y) -> str:
+        citytile: CityTile = self.citytiles_by_xy.get((x, y))
         if not citytile:
             return None
         return citytile.cityid
@@ -53,5 +89,69 @@ class GameMap:
         """
         do not use this function, this is for internal tracking of state
         """
-        cell = self.get_cell(x, y)
-        cell.resource = Resource(r_type, amount)
\ No newline at end of file
+        self.resource_type[y, x] = RESOURCE_TYPE_CODES[r_type]
+        self.resource_amount[y, x] = amount
+
+    def _removeResource(self, x, y):
+        """
+        do not use this function, this is for internal tracking of state
+        """
+        self.resource_type[y, x] = 0
+        self.resource_amount[y, x] = 0
+
+    def _setResources(self, resources: np.ndarray):
+        """
+        do not use this function, this is for internal tracking of state
+        """
+        # resources is a record array from parse_updates, resources not listed are removed
+        self.resource_type[:] = 0
+        self.resource_amount[:] = 0
+        self.resource_type[resources['y'], resources['x']] = resources['type']
+        self.resource_amount[resources['y'], resources['x']] = resources['amount']
+
+    def _setRoad(self, x, y, road):
+        """
+        do not use this function, this is for internal tracking of state
+        """
+        self.road[y, x] = road
+
+    def _setRoads(self, roads: np.ndarray):
+        """
+        do not use this function, this is for internal tracking of state
+        """
+        # roads is a record array from parse_updates, roads not listed are set to zero
+        self.road[:] = 0
+        self.road[roads['y'], roads['x']] = roads['road']
+
+    def _setUnit(self, x, y, unit: Unit):
+        """
+        do not use this function, this is for internal tracking of state
+        """
+        self.units_by_xy[x, y] = unit
+        self.unit_count[y, x] += 1
+
+    def _clearUnits(self):
+        """
+        do not use this function, this is for internal tracking of state
+        """
+        self.units_by_xy.clear()
+        self.unit_count[:] = 0
+
+    def _setCityTile(self, x, y, citytile: CityTile):
+        """
+        do not use this function, this is for internal tracking of state
+        """
+        if citytile.cityid not in self.cityid_to_index:
+            self.cityid_to_index[citytile.cityid] = len(self.cityids)
+            self.cityids.append(citytile.cityid)
+        self.citytiles_by_xy[x, y] = citytile
+        self.citytile_team[y, x] = citytile.team
+        self.citytile_city[y, x] = self.cityid_to_index[citytile.cityid]
+
+    def _clearCityTiles(self):
+        """
+        do not use this function, this is for internal tracking of state
+        """
+        self.citytiles_by_xy.clear()
+        self.citytile_team[:] = -1
+        self.citytile_city[:] = -1
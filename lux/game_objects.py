@@ -45,8 +45,15 @@ class City:
     def __init__(self, teamid, cityid, fuel, light_upkeep, night_turns_left):
         self.cityid = cityid
         self.team = teamid
-        self.fuel = fuel
         self.citytiles: list[CityTile] = []
+        self._update(fuel, light_upkeep, night_turns_left)
+
+    def _update(self, fuel, light_upkeep, night_turns_left):
+        """
+        do not use this function, this is for internal tracking of state
+        """
+        self.citytiles.clear()  # added again from the updates
+        self.fuel = fuel
         self.light_upkeep = light_upkeep
         self.night_fuel_duration = int(self.fuel // self.light_upkeep)
         self.fuel_needed_for_game = light_upkeep * night_turns_left - fuel
@@ -144,8 +151,18 @@ class Unit:
         self.team = teamid
         self.id = unitid
         self.type = u_type
-        self.cooldown = cooldown
         self.cargo = Cargo()
+        self._update(x, y, cooldown, wood, coal, uranium)
+
+    def _update(self, x, y, cooldown, wood, coal, uranium):
+        """
+        do not use this function, this is for internal tracking of state
+        resets everything the agent may have simulated on the unit during the previous turn
+        """
+        if self.pos.x != x or self.pos.y != y:
+            # positions may be referred to by missions, do not modify in place
+            self.pos = Position(x, y)
+        self.cooldown = cooldown
         self.cargo.wood = wood
         self.cargo.coal = coal
         self.cargo.uranium = uranium
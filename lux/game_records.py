@@ -0,0 +1,85 @@
+from typing import Dict, List
+
+import numpy as np
+
+from .constants import Constants
+from .game_map import RESOURCE_TYPE_CODES
+
+INPUT_CONSTANTS = Constants.INPUT_CONSTANTS
+
+UNIT_DTYPE = np.dtype([
+    ('type', np.int8), ('team', np.int8), ('x', np.int16), ('y', np.int16),
+    ('cooldown', np.float64), ('wood', np.int32), ('coal', np.int32), ('uranium', np.int32)])
+CITY_DTYPE = np.dtype([
+    ('team', np.int8), ('fuel', np.float64), ('light_upkeep', np.float64)])
+CITYTILE_DTYPE = np.dtype([
+    ('team', np.int8), ('city', np.int32), ('x', np.int16), ('y', np.int16), ('cooldown', np.float64)])  # city indexes city_ids
+RESOURCE_DTYPE = np.dtype([
+    ('type', np.int8), ('x', np.int16), ('y', np.int16), ('amount', np.int32)])  # type is from RESOURCE_TYPE_CODES
+ROAD_DTYPE = np.dtype([
+    ('x', np.int16), ('y', np.int16), ('road', np.float64)])
+
+
+class UpdateRecords:
+    # the update lines of one turn as typed record arrays, rows are in the order of the updates
+    def __init__(self, units: np.ndarray, unit_ids: List[str], cities: np.ndarray, city_ids: List[str],
+                 citytiles: np.ndarray, resources: np.ndarray, roads: np.ndarray, research_points: np.ndarray):
+        self.units = units
+        self.unit_ids = unit_ids
+        self.cities = cities
+        self.city_ids = city_ids
+        self.citytiles = citytiles
+        self.resources = resources
+        self.roads = roads
+        self.research_points = research_points  # indexed by team
+
+
+def parse_updates(updates: List[str]) -> UpdateRecords:
+    """
+    tokenize the update lines of a turn once, lines that are not updates are ignored
+    """
+    units, unit_ids = [], []
+    cities, city_ids = [], []
+    city_id_to_index: Dict[str, int] = {}
+    citytiles = []
+    resources = []
+    roads = []
+    research_points = [0, 0]
+
+    for update in updates:
+        if update == INPUT_CONSTANTS.DONE:
+            break
+        strs = update.split(" ")
+        input_identifier = strs[0]
+
+        if input_identifier == INPUT_CONSTANTS.RESOURCES:
+            resources.append((RESOURCE_TYPE_CODES[strs[1]], int(strs[2]), int(strs[3]), int(float(strs[4]))))
+
+        elif input_identifier == INPUT_CONSTANTS.UNITS:
+            unit_ids.append(strs[3])
+            units.append((int(strs[1]), int(strs[2]), int(strs[4]), int(strs[5]), float(strs[6]),
+                          int(strs[7]), int(strs[8]), int(strs[9])))
+
+        elif input_identifier == INPUT_CONSTANTS.CITY:
+            city_id_to_index[strs[2]] = len(city_ids)
+            city_ids.append(strs[2])
+            cities.append((int(strs[1]), float(strs[3]), float(strs[4])))
+
+        elif input_identifier == INPUT_CONSTANTS.CITY_TILES:
+            citytiles.append((int(strs[1]), city_id_to_index[strs[2]], int(strs[3]), int(strs[4]), float(strs[5])))
+
+        elif input_identifier == INPUT_CONSTANTS.ROADS:
+            roads.append((int(strs[1]), int(strs[2]), float(strs[3])))
+
+        elif input_identifier == INPUT_CONSTANTS.RESEARCH_POINTS:
+            research_points[int(strs[1])] = int(strs[2])
+
+    return UpdateRecords(
+        units=np.array(units, dtype=UNIT_DTYPE),
+        unit_ids=unit_ids,
+        cities=np.array(cities, dtype=CITY_DTYPE),
+        city_ids=city_ids,
+        citytiles=np.array(citytiles, dtype=CITYTILE_DTYPE),
+        resources=np.array(resources, dtype=RESOURCE_DTYPE),
+        roads=np.array(roads, dtype=ROAD_DTYPE),
+        research_points=np.array(research_points))
@@ -0,0 +1,33 @@
+class InferenceBudget:
+    # chooses the number of test-time transforms from the measured latency of the imitation model
+    # latencies are in milliseconds per sample, a sample is one unit under one transform
+
+    def __init__(self, latency_target=1500, prior_sample_latency=5., smoothing=0.3,
+                 max_transforms=8, max_batch_size=256, skipped_observations=2):
+        self.latency_target = latency_target  # time allowed for inference in a turn
+        self.sample_latency = prior_sample_latency  # tuned on the machine that the constants were written for
+        self.smoothing = smoothing
+        self.max_transforms = max_transforms
+        self.max_batch_size = max_batch_size  # samples in one forward pass
+        self.skipped_observations = skipped_observations  # torchscript optimises the model over the first calls
+        self.observations = 0
+
+    def observe(self, samples, seconds):
+        # exponentially weighted moving average of the latency per sample
+        self.observations += 1
+        if self.observations <= self.skipped_observations or samples == 0:
+            return
+        sample_latency = seconds * 1000 / samples
+        self.sample_latency += self.smoothing * (sample_latency - self.sample_latency)
+
+    def number_of_transforms(self, units, time_left=None):
+        # a slower machine gets fewer transforms, but every unit is evaluated at least once
+        budget = self.latency_target
+        if time_left is not None:
+            budget = min(budget, time_left)
+        allowed_samples = int(max(0, budget) / self.sample_latency)
+        return max(1, min(self.max_transforms, allowed_samples // max(1, units)))
+
+    def units_per_batch(self, number_of_transforms):
+        # large batches are split so that the memory of one forward pass is bounded
+        return max(1, self.max_batch_size // number_of_transforms)
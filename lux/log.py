@@ -0,0 +1,73 @@
+import builtins as __builtin__
+import os
+from typing import Dict
+
+DEBUG = 10
+INFO = 20
+OFF = 100
+
+LEVEL_NAMES = {"debug": DEBUG, "info": INFO, "off": OFF}
+
+
+class lazy:
+    # an argument that is only computed when the message is printed
+    def __init__(self, function):
+        self.function = function
+
+    def __str__(self):
+        return str(self.function())
+
+
+class Printer:
+    # drop-in for print, the arguments are not formatted when disabled
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+
+    def __call__(self, *args, **kwargs):
+        if self.enabled:
+            __builtin__.print(*args, **kwargs)
+
+
+DISABLED = Printer(False)
+ENABLED = Printer(True)
+
+
+class Logger:
+    def __init__(self, name: str, level: int = OFF):
+        self.name = name
+        self.level = level
+
+    def is_enabled_for(self, level: int) -> bool:
+        return level >= self.level
+
+    def printer(self, debug=False, level: int = DEBUG) -> Printer:
+        # the DEBUG argument of the functions still turns on their output
+        if debug or self.is_enabled_for(level):
+            return ENABLED
+        return DISABLED
+
+
+loggers: Dict[str, Logger] = {}
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    # "make_actions=debug,heuristics=info", or "all=debug" for every subsystem
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = LEVEL_NAMES[level.strip().lower()]
+    return levels
+
+
+configured_levels = parse_levels(os.environ.get("LUX_LOG", ""))
+
+
+def get_logger(name: str) -> Logger:
+    if name not in loggers:
+        loggers[name] = Logger(name, configured_levels.get(name, configured_levels.get("all", OFF)))
+    return loggers[name]
+
+
+def set_level(name: str, level: int):
+    get_logger(name).level = level
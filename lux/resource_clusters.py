@@ -0,0 +1,121 @@
+from typing import Tuple
+
+import numpy as np
+
+from .connected_components import offset_slices, propagate_labels
+
+
+class ResourceClusters:
+    # resource clusters over the flat cell index y * width + x
+    # the label of a cell is the flat index of the first cell of its cluster
+    # cells that are not part of a cluster are a cluster on their own
+    # the cluster statistics are arrays indexed by the label
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.labels = np.arange(height * width).reshape(height, width)
+        self.points = np.zeros(height * width, dtype=int)  # 1 point for wood, 3 point for coal, 5 point for uranium
+        self.tiles = np.zeros(height * width, dtype=int)  # 1 point for all resource
+        self.citytiles = np.zeros(height * width, dtype=int)  # 1 point for citytile next to cluster
+        self.dist_from_player = np.full(height * width, 100)  # closest distance from player
+        self.dist_from_opponent = np.full(height * width, 100)  # closest distance from opponent
+
+        # the masks the clusters were built from, kept across turns
+        self.collectable = None
+        self.player_city = None
+
+    def update(self, collectable: np.ndarray, player_city: np.ndarray):
+        # the clusters are rebuilt if the collectable tiles changed, that is when a resource is depleted or researched
+        # if only the player citytiles changed, only the clusters around the changed citytiles are rebuilt
+        if self.collectable is None or not np.array_equal(collectable, self.collectable):
+            self.build(collectable, player_city)
+        elif not np.array_equal(player_city, self.player_city):
+            changed = player_city != self.player_city
+            around_changed = changed.copy()
+            for dy, dx in [(0,1), (1,0), (0,-1), (-1,0)]:
+                p, q = offset_slices(dy, dx, self.height, self.width)
+                around_changed[p] |= changed[q]
+            # edges do not leave a cluster, so the clusters around the change can be rebuilt on their own
+            region = np.isin(self.labels, self.labels[around_changed]) | around_changed
+            self.build(collectable, player_city, region)
+        self.collectable = collectable.copy()
+        self.player_city = player_city.copy()
+
+    def build(self, collectable: np.ndarray, player_city: np.ndarray, region: np.ndarray = None):
+        # collectable resource tiles are joined with
+        # - the adjacent collectable tiles and player citytiles
+        # - every tile two steps away
+        # the remaining tiles adjacent to a collectable tile are then absorbed, without joining clusters
+        # only the tiles in the region are relabelled, the region must consist of entire clusters
+        height, width = self.height, self.width
+        if region is None:
+            region = np.ones((height, width), dtype=bool)
+
+        edges = []
+        for dy, dx in [(0,1), (1,0)]:
+            p, q = offset_slices(dy, dx, height, width)
+            edge = np.zeros((height, width), dtype=bool)
+            edge[p] = (collectable[p] & (collectable[q] | player_city[q])) | (player_city[p] & collectable[q])
+            edge[p] &= region[p] & region[q]
+            edges.append(((dy, dx), edge))
+        for dy, dx in [(0,2), (2,0), (1,1), (1,-1)]:
+            p, q = offset_slices(dy, dx, height, width)
+            edge = np.zeros((height, width), dtype=bool)
+            edge[p] = (collectable[p] | collectable[q]) & region[p] & region[q]
+            edges.append(((dy, dx), edge))
+        labels = np.where(region, np.arange(height * width).reshape(height, width), self.labels)
+        labels = propagate_labels(labels, edges)
+
+        # the collectable tiles adjacent to an unclustered tile are in the same cluster
+        unclustered = (np.bincount(labels.ravel(), minlength=height * width)[labels] == 1) & ~collectable & ~player_city
+        unclustered &= region
+        absorbed = labels.copy()
+        for dy, dx in [(0,1), (1,0), (0,-1), (-1,0)]:
+            p, q = offset_slices(dy, dx, height, width)
+            absorbing = unclustered[p] & collectable[q]
+            absorbed[p] = np.where(absorbing, labels[q], absorbed[p])
+        self.labels = absorbed
+
+    def set_statistics(self, counted: np.ndarray, wood: np.ndarray, coal: np.ndarray, uranium: np.ndarray,
+                       player_city: np.ndarray):
+        # only the tiles in the counted mask contribute to their cluster
+        cell_points = counted * (wood * 1 + coal * 3 + uranium * 5)
+        cell_tiles = counted * ((wood > 0).astype(int) + (coal > 0) + (uranium > 0))
+        cell_citytiles = counted * (player_city > 0)
+        labels, size = self.labels.ravel(), self.height * self.width
+        self.points = np.bincount(labels, weights=cell_points.ravel(), minlength=size).astype(int)
+        self.tiles = np.bincount(labels, weights=cell_tiles.ravel(), minlength=size).astype(int)
+        self.citytiles = np.bincount(labels, weights=cell_citytiles.ravel(), minlength=size).astype(int)
+
+    def set_distances(self, counted: np.ndarray, distance_from_player: np.ndarray, distance_from_opponent: np.ndarray):
+        # closest distance from the tiles in the counted mask, 100 if the cluster has none
+        self.dist_from_player = np.full(self.height * self.width, 100)
+        self.dist_from_opponent = np.full(self.height * self.width, 100)
+        np.minimum.at(self.dist_from_player, self.labels[counted], distance_from_player[counted])
+        np.minimum.at(self.dist_from_opponent, self.labels[counted], distance_from_opponent[counted])
+
+    def find(self, a: Tuple) -> int:
+        x, y = a
+        return int(self.labels[y,x])
+
+    def get_point(self, a: Tuple) -> int:
+        return int(self.points[self.find(a)])
+
+    def get_leader_point(self, leader: int) -> int:
+        return int(self.points[leader])
+
+    def get_tiles(self, a: Tuple) -> int:
+        return int(self.tiles[self.find(a)])
+
+    def get_citytiles(self, a: Tuple) -> int:
+        return int(self.citytiles[self.find(a)])
+
+    def get_dist_from_player(self, a: Tuple) -> int:
+        return int(self.dist_from_player[self.find(a)])
+
+    def get_dist_from_opponent(self, a: Tuple) -> int:
+        return int(self.dist_from_opponent[self.find(a)])
+
+    def get_group_count(self) -> int:
+        return int(np.sum(self.points > 1))
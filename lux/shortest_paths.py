@@ -0,0 +1,112 @@
+import heapq
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+UNREACHED = np.iinfo(np.int32).max // 2
+
+
+@lru_cache(maxsize=None)
+def neighbour_table(height: int, width: int) -> List[List[int]]:
+    # flat indices of the (up to) four neighbours of each cell
+    table = []
+    for y in range(height):
+        for x in range(width):
+            table.append([(y+dy) * width + (x+dx) for dx, dy in [(0,-1), (1,0), (0,1), (-1,0)]
+                          if 0 <= x+dx < width and 0 <= y+dy < height])
+    return table
+
+
+def dial_distances(cost: np.ndarray, sx: int, sy: int) -> np.ndarray:
+    # shortest path distance from (sx,sy) to every cell, where cost[y,x] is the cost of entering the cell
+    # the costs are small positive integers, so the queue is a circular array of buckets indexed by distance
+    height, width = cost.shape
+    costs = cost.ravel().tolist()
+    neighbours = neighbour_table(height, width)
+    number_of_buckets = max(costs) + 1
+    buckets = [[] for _ in range(number_of_buckets)]
+
+    unreached = 1 << 30
+    distances = [unreached] * (height * width)
+    start = sy * width + sx
+    distances[start] = 0
+    buckets[0].append(start)
+    queued, current = 1, 0
+    while queued:
+        bucket = buckets[current % number_of_buckets]
+        while bucket:
+            node = bucket.pop()
+            queued -= 1
+            if distances[node] != current:
+                continue  # already reached with a shorter distance
+            for neighbour in neighbours[node]:
+                distance = current + costs[neighbour]
+                if distance < distances[neighbour]:
+                    distances[neighbour] = distance
+                    buckets[distance % number_of_buckets].append(neighbour)
+                    queued += 1
+        current += 1
+
+    return np.array(distances, dtype=np.int16).reshape(height, width)
+
+
+def astar_distances(cost: np.ndarray, sx: int, sy: int, goals: List[Tuple]) -> List[int]:
+    # shortest path distance from (sx,sy) to each of the goals, with the same costs as dial_distances
+    # the heuristic is the manhattan distance to the box around the goals, and the search stops when every goal is reached
+    height, width = cost.shape
+    costs = cost.ravel().tolist()
+    neighbours = neighbour_table(height, width)
+    min_x, max_x = min(gx for gx, gy in goals), max(gx for gx, gy in goals)
+    min_y, max_y = min(gy for gx, gy in goals), max(gy for gx, gy in goals)
+
+    def heuristic(node):
+        y, x = divmod(node, width)
+        return max(0, min_x - x, x - max_x) + max(0, min_y - y, y - max_y)
+
+    unreached = 1 << 30
+    distances = [unreached] * (height * width)
+    settled = [False] * (height * width)
+    remaining = set(gy * width + gx for gx, gy in goals)
+    start = sy * width + sx
+    distances[start] = 0
+    heap = [(heuristic(start), 0, start)]
+    while remaining:
+        _, distance, node = heapq.heappop(heap)
+        if settled[node]:
+            continue
+        settled[node] = True
+        remaining.discard(node)
+        for neighbour in neighbours[node]:
+            neighbour_distance = distance + costs[neighbour]
+            if neighbour_distance < distances[neighbour]:
+                distances[neighbour] = neighbour_distance
+                heapq.heappush(heap, (neighbour_distance + heuristic(neighbour), neighbour_distance, neighbour))
+
+    return [distances[gy * width + gx] for gx, gy in goals]
+
+
+def batched_distances(cost: np.ndarray, starts: List[Tuple]) -> np.ndarray:
+    # distance fields from each of the starts at once, with the same costs as dial_distances
+    height, width = cost.shape
+    distances = np.full((len(starts), height, width), UNREACHED, dtype=np.int32)
+    for k, (sx, sy) in enumerate(starts):
+        distances[k,sy,sx] = 0
+    return relax_distances(distances, cost)
+
+
+def relax_distances(distances: np.ndarray, cost: np.ndarray) -> np.ndarray:
+    # every cell takes the smallest distance of its neighbours plus its own cost, until nothing changes
+    # the (K, H, W) int32 distances must not be below the shortest path distances
+    cost = cost.astype(np.int32)
+    while True:
+        through_neighbour = np.full_like(distances, UNREACHED)
+        np.minimum(through_neighbour[:,1:], distances[:,:-1], out=through_neighbour[:,1:])
+        np.minimum(through_neighbour[:,:-1], distances[:,1:], out=through_neighbour[:,:-1])
+        np.minimum(through_neighbour[:,:,1:], distances[:,:,:-1], out=through_neighbour[:,:,1:])
+        np.minimum(through_neighbour[:,:,:-1], distances[:,:,1:], out=through_neighbour[:,:,:-1])
+        through_neighbour += cost
+        updated = np.minimum(distances, through_neighbour)
+        if np.array_equal(updated, distances):
+            return distances.astype(np.int16)
+        distances = updated
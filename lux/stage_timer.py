@@ -0,0 +1,54 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable
+
+import numpy as np
+
+
+class StageTimer:
+    # wall time of the stages of one turn, in seconds
+    # a stage that runs more than once in a turn is numbered, e.g. calculate_features#2
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    def reset(self):
+        self.timings = {}
+
+    @contextmanager
+    def time(self, stage: str):
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            label, count = stage, 1
+            while label in self.timings:
+                count += 1
+                label = "{}#{}".format(stage, count)
+            self.timings[label] = time.time() - start_time
+
+    def slowest(self, count=3) -> str:
+        # short summary for the sidetext
+        stages = sorted(self.timings.items(), key=lambda item: item[1], reverse=True)[:count]
+        return " ".join("{}: {:.0f}ms".format(stage, 1000 * seconds) for stage, seconds in stages)
+
+    def to_json(self, step: int, player_id: int) -> str:
+        return json.dumps({"step": step, "player": player_id,
+                           "stages": {stage: round(1000 * seconds, 3) for stage, seconds in self.timings.items()}})
+
+
+def summarize(lines: Iterable[str]) -> Dict[str, Dict[str, float]]:
+    # percentiles in milliseconds of each stage over the turns in the jsonl lines
+    milliseconds: Dict[str, list] = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        for stage, value in json.loads(line)["stages"].items():
+            milliseconds.setdefault(stage, []).append(value)
+    return {stage: {"turns": len(values),
+                    "p50": float(np.percentile(values, 50)),
+                    "p99": float(np.percentile(values, 99)),
+                    "max": float(np.max(values))}
+            for stage, values in milliseconds.items()}
+
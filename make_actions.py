@@ -1,6 +1,6 @@
 # functions executing the actions
 
-import builtins as __builtin__
+from lux.log import get_logger, lazy
 from typing import Tuple, List, Set
 
 from lux.game import Game, Mission, Missions, Observation, cleanup_missions
@@ -10,15 +10,16 @@ from lux.constants import Constants
 from lux.game_constants import GAME_CONSTANTS
 import lux.annotate as annotate
 
-from heuristics import find_best_cluster
-from imitation_agent import get_imitation_action
+from heuristics import find_best_cluster, assign_best_clusters
+from imitation_agent import get_imitation_actions
 
 DIRECTIONS = Constants.DIRECTIONS
 
+logger = get_logger("make_actions")
+
 
 def make_city_actions(game_state: Game, missions: Missions, DEBUG=False) -> List[str]:
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+    print = logger.printer(DEBUG)
 
     player = game_state.player
     cleanup_missions(game_state, missions, DEBUG=DEBUG)
@@ -95,7 +96,7 @@ def make_city_actions(game_state: Game, missions: Missions, DEBUG=False) -> List
     def calculate_city_cluster_bonus(pos: Position):
         current_leader = game_state.xy_to_resource_group_id.find(tuple(pos))
         units_mining_on_current_cluster = game_state.resource_leader_to_locating_units[current_leader] & game_state.resource_leader_to_targeting_units[current_leader]
-        resource_size_of_current_cluster = game_state.xy_to_resource_group_id.get_point(current_leader)
+        resource_size_of_current_cluster = game_state.xy_to_resource_group_id.get_leader_point(current_leader)
         return resource_size_of_current_cluster / (1+len(units_mining_on_current_cluster))
 
 
@@ -110,28 +111,30 @@ def make_city_actions(game_state: Game, missions: Missions, DEBUG=False) -> List
         city_tile.pos.y * game_state.y_order_coefficient
     ),)
 
-    print("".join([str((city_tile.pos.x, city_tile.pos.y,
-        - calculate_city_cluster_bonus(city_tile.pos),
-        - max(1, game_state.distance_from_player_units[city_tile.pos.y,city_tile.pos.x])  # max because we assume that it will leave
-        + max(0, game_state.distance_from_opponent_assets[city_tile.pos.y,city_tile.pos.x] / 2)
-        + game_state.player_units_matrix[city_tile.pos.y,city_tile.pos.x],
-        - game_state.distance_from_collectable_resource[city_tile.pos.y,city_tile.pos.x],
-        - game_state.distance_from_edge[city_tile.pos.y,city_tile.pos.x],
-        city_tile.pos.x * game_state.x_order_coefficient,
-        city_tile.pos.y * game_state.y_order_coefficient
-    ),) + "\n" for city_tile in city_tiles]))
+    if print.enabled:
+        print("".join([str((city_tile.pos.x, city_tile.pos.y,
+            - calculate_city_cluster_bonus(city_tile.pos),
+            - max(1, game_state.distance_from_player_units[city_tile.pos.y,city_tile.pos.x])  # max because we assume that it will leave
+            + max(0, game_state.distance_from_opponent_assets[city_tile.pos.y,city_tile.pos.x] / 2)
+            + game_state.player_units_matrix[city_tile.pos.y,city_tile.pos.x],
+            - game_state.distance_from_collectable_resource[city_tile.pos.y,city_tile.pos.x],
+            - game_state.distance_from_edge[city_tile.pos.y,city_tile.pos.x],
+            city_tile.pos.x * game_state.x_order_coefficient,
+            city_tile.pos.y * game_state.y_order_coefficient
+        ),) + "\n" for city_tile in city_tiles]))
 
     for city_tile in city_tiles:
         if not city_tile.can_act():
             continue
 
-        print("city_tile values", -calculate_city_cluster_bonus(city_tile.pos),
-        - max(1, game_state.distance_from_player_units[city_tile.pos.y,city_tile.pos.x])  # max because we assume that it will leave
-        + game_state.distance_from_opponent_assets[city_tile.pos.y,city_tile.pos.x],
-        - game_state.distance_from_collectable_resource[city_tile.pos.y,city_tile.pos.x],
-        - game_state.distance_from_edge[city_tile.pos.y,city_tile.pos.x],
-        city_tile.pos.x * game_state.x_order_coefficient,
-        city_tile.pos.y * game_state.y_order_coefficient)
+        if print.enabled:
+            print("city_tile values", -calculate_city_cluster_bonus(city_tile.pos),
+            - max(1, game_state.distance_from_player_units[city_tile.pos.y,city_tile.pos.x])  # max because we assume that it will leave
+            + game_state.distance_from_opponent_assets[city_tile.pos.y,city_tile.pos.x],
+            - game_state.distance_from_collectable_resource[city_tile.pos.y,city_tile.pos.x],
+            - game_state.distance_from_edge[city_tile.pos.y,city_tile.pos.x],
+            city_tile.pos.x * game_state.x_order_coefficient,
+            city_tile.pos.y * game_state.y_order_coefficient)
 
         unit_limit_exceeded = (units_cnt >= units_cap)
 
@@ -211,9 +214,8 @@ def make_city_actions(game_state: Game, missions: Missions, DEBUG=False) -> List
     return reset_missions, actions
 
 
-def make_unit_missions(game_state: Game, missions: Missions, is_subsequent_plan=False, DEBUG=False) -> Missions:
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+def make_unit_missions(game_state: Game, missions: Missions, is_subsequent_plan=False, joint_assignment=False, DEBUG=False) -> Missions:
+    print = logger.printer(DEBUG)
 
     player = game_state.player
     cleanup_missions(game_state, missions, DEBUG=DEBUG)
@@ -412,6 +414,29 @@ def make_unit_missions(game_state: Game, missions: Missions, is_subsequent_plan=
             if not unit.can_act():
                 break
 
+    def plan_adaptative_or_homing_mission(unit: Unit, best_position: Position, best_cell_value: List, cluster_annotation: List):
+        print(unit.id, best_position, best_cell_value)
+        distance_from_best_position = game_state.retrieve_distance(unit.pos.x, unit.pos.y, best_position.x, best_position.y)
+        if best_cell_value > [0,0,0,0]:
+            print("plan mission adaptative", unit.id, unit.pos, "->", best_position, best_cell_value)
+            mission = Mission(unit.id, best_position, delays=distance_from_best_position)
+            missions.add(mission)
+            game_state.unit_ids_with_missions_assigned_this_turn.add(unit.id)
+            cluster_annotations.extend(cluster_annotation)
+            return
+
+        # homing mission
+        if unit.get_cargo_space_used() > 0:
+            homing_distance, homing_position = game_state.find_nearest_city_requiring_fuel(unit, DEBUG=DEBUG)
+            print("homing mission", unit.id, unit.pos, "->", homing_position, homing_distance)
+            mission = Mission(unit.id, homing_position, "", details="homing", delays=homing_distance + 2)
+            missions.add(mission)
+            game_state.unit_ids_with_missions_assigned_this_turn.add(unit.id)
+
+    # with joint assignment, the units reaching the adaptative mission are assigned together after the loop
+    units_to_assign: List[Unit] = []
+    missions_of_targets = None
+
     # main sequence
     for unit in player.units:
         if unit.id in game_state.unit_ids_with_missions_assigned_this_turn:
@@ -420,8 +445,10 @@ def make_unit_missions(game_state: Game, missions: Missions, is_subsequent_plan=
         current_mission: Mission = missions[unit.id] if unit.id in missions else None
         current_target = current_mission.target_position if current_mission else None
 
-        # avoid sharing the same target
-        game_state.repopulate_targets(missions)
+        # avoid sharing the same target, the targets only change with the missions
+        if dict(missions) != missions_of_targets:
+            game_state.repopulate_targets(missions)
+            missions_of_targets = dict(missions)
 
         # do not make missions from a fortress
         if game_state.distance_from_floodfill_by_player_city[unit.pos.y, unit.pos.x] > 1:
@@ -458,7 +485,7 @@ def make_unit_missions(game_state: Game, missions: Missions, is_subsequent_plan=
 
         current_leader = game_state.xy_to_resource_group_id.find(tuple(unit.pos))
         units_mining_on_current_cluster = game_state.resource_leader_to_locating_units[current_leader] & game_state.resource_leader_to_targeting_units[current_leader]
-        resource_size_of_current_cluster = game_state.xy_to_resource_group_id.get_point(current_leader)
+        resource_size_of_current_cluster = game_state.xy_to_resource_group_id.get_leader_point(current_leader)
         current_cluster_load = len(units_mining_on_current_cluster) / (0.01+resource_size_of_current_cluster)
 
         # if you are targeting your own cluster you are at and you have at least 60 wood and close to edge
@@ -637,32 +664,24 @@ def make_unit_missions(game_state: Game, missions: Missions, is_subsequent_plan=
                 cluster_annotations.append(annotation)
                 continue
 
-        best_position, best_cell_value, cluster_annotation = find_best_cluster(game_state, unit, DEBUG=DEBUG)
-        print(unit.id, best_position, best_cell_value)
-        distance_from_best_position = game_state.retrieve_distance(unit.pos.x, unit.pos.y, best_position.x, best_position.y)
-        if best_cell_value > [0,0,0,0]:
-            print("plan mission adaptative", unit.id, unit.pos, "->", best_position, best_cell_value)
-            mission = Mission(unit.id, best_position, delays=distance_from_best_position)
-            missions.add(mission)
-            game_state.unit_ids_with_missions_assigned_this_turn.add(unit.id)
-            cluster_annotations.extend(cluster_annotation)
+        if joint_assignment:
+            units_to_assign.append(unit)
             continue
 
-        # homing mission
-        if unit.get_cargo_space_used() > 0:
-            homing_distance, homing_position = game_state.find_nearest_city_requiring_fuel(unit, DEBUG=DEBUG)
-            print("homing mission", unit.id, unit.pos, "->", homing_position, homing_distance)
-            mission = Mission(unit.id, homing_position, "", details="homing", delays=homing_distance + 2)
-            missions.add(mission)
-            game_state.unit_ids_with_missions_assigned_this_turn.add(unit.id)
-            continue
+        best_position, best_cell_value, cluster_annotation = find_best_cluster(game_state, unit, DEBUG=DEBUG)
+        plan_adaptative_or_homing_mission(unit, best_position, best_cell_value, cluster_annotation)
+
+    if units_to_assign:
+        game_state.repopulate_targets(missions)
+        for unit, (best_position, best_cell_value, cluster_annotation) in \
+                zip(units_to_assign, assign_best_clusters(game_state, units_to_assign, DEBUG=DEBUG)):
+            plan_adaptative_or_homing_mission(unit, best_position, best_cell_value, cluster_annotation)
 
     return actions_ejections + cluster_annotations
 
 
 def make_unit_actions(game_state: Game, missions: Missions, DEBUG=False) -> Tuple[Missions, List[str]]:
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+    print = logger.printer(DEBUG)
 
     player, opponent = game_state.player, game_state.opponent
     actions = []
@@ -751,21 +770,18 @@ def make_unit_actions(game_state: Game, missions: Missions, DEBUG=False) -> Tupl
 
 def make_unit_actions_supplementary(game_state: Game, missions: Missions, observation: Observation,
                                     initial=False, DEBUG=False) -> Tuple[Missions, List[str]]:
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+    print = logger.printer(DEBUG)
 
     player, opponent = game_state.player, game_state.opponent
     actions = []
 
     if initial:
-      for unit in player.units:
-        if unit.can_act():
-            if not unit.use_rule_base:
-                actions_from_imitation = get_imitation_action(observation, game_state, unit, DEBUG=DEBUG,
-                                                              use_probabilistic_sort=False)
-                actions.extend(actions_from_imitation)
+        units_using_imitation = [unit for unit in player.units if unit.can_act() and not unit.use_rule_base]
+        actions_from_imitation = get_imitation_actions(observation, game_state, units_using_imitation, DEBUG=DEBUG,
+                                                       use_probabilistic_sort=False)
+        actions.extend(actions_from_imitation)
 
-    print("units without actions", [unit.id for unit in player.units if unit.can_act()])
+    print("units without actions", lazy(lambda: [unit.id for unit in player.units if unit.can_act()]))
 
     # probably should reduce code repetition in the following lines
     def make_random_move_to_void(unit: Unit, annotation: str = ""):
@@ -1098,13 +1114,18 @@ def make_unit_actions_supplementary(game_state: Game, missions: Missions, observ
 
 
 def attempt_direction_to(game_state: Game, unit: Unit, target_pos: Position, avoid_opponent_units=False, use_exact=False, DEBUG=False) -> DIRECTIONS:
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+    print = logger.printer(DEBUG)
 
     smallest_cost = [2,2,2,2,2]
     closest_dir = DIRECTIONS.CENTER
     closest_pos = unit.pos
 
+    if use_exact:
+        # one search from the target for all the tiles the unit can move to
+        candidates = [tuple(unit.pos.translate(direction, 1)) for direction in game_state.dirs]
+        candidates = [xy for xy in candidates if xy not in game_state.xy_out_of_map]
+        game_state.retrieve_exact_distances(candidates, target_pos.x, target_pos.y)
+
     for direction in game_state.dirs:
         newpos = unit.pos.translate(direction, 1)
 
@@ -1,16 +1,18 @@
+import os
 import time
 from itertools import chain
 from typing import List
 
-import builtins as __builtin__
+from lux.log import get_logger
 
 from lux.game import Game, Mission, Missions, Player, Unit
 import lux.annotate as annotate
 
+logger = get_logger("make_annotations")
+
 
 def annotate_game_state(game_state: Game, DEBUG=False):
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+    print = logger.printer(DEBUG)
 
     print("Turn number: ", game_state.turn)
     print("Citytile count: ", game_state.player.city_tile_count)
@@ -51,8 +53,7 @@ def annotate_game_state(game_state: Game, DEBUG=False):
 
 
 def annotate_missions(game_state: Game, missions: Missions, DEBUG=False):
-    if DEBUG: print = __builtin__.print
-    else: print = lambda *args: None
+    print = logger.printer(DEBUG)
 
     print("Missions")
     print(missions)
@@ -79,7 +80,8 @@ def annotate_missions(game_state: Game, missions: Missions, DEBUG=False):
         len(game_state.player.units), len(game_state.opponent.units),
         len(game_state.player_city_tile_xy_set), len(game_state.opponent_city_tile_xy_set),
         game_state.targeted_cluster_count, game_state.xy_to_resource_group_id.get_group_count(),
-        time.time() - game_state.compute_start_time))
+        time.time() - game_state.compute_start_time) +
+        (" " + game_state.stage_timer.slowest() if os.environ.get('LUX_TIMING_SIDETEXT', '') else ""))
     annotations.append(annotation)
 
     return annotations
@@ -0,0 +1,82 @@
+"""
+re-run game_logic on a recorded turn
+
+python replay.py snapshots/game-20211201-120000-000000-0.lxa 250 --repeat 5
+python replay.py snapshots 250 --player 0  # pickles written by older versions of the agent
+"""
+import argparse
+import os
+import pickle
+import re
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import agent
+from lux.game import Game, Missions, Observation
+from lux.distance_cache import DistanceCache
+from lux.resource_clusters import ResourceClusters
+from lux.stage_timer import StageTimer
+from imitation_agent import warm_up
+from snapshot_archive import SnapshotArchive
+
+
+def load_turn(path: str, step: int, player: int = 0) -> Tuple[Observation, Game, Missions]:
+    # the game state is recorded after the updates of the turn, and the missions before the turn is played
+    if os.path.isdir(path):
+        str_step = str(step).zfill(3)
+        loaded = []
+        for name in ["observation", "game_state", "missions"]:
+            with open(os.path.join(path, '{}-{}-{}.pkl'.format(name, str_step, player)), 'rb') as handle:
+                loaded.append(pickle.load(handle))
+        return tuple(loaded)
+    return SnapshotArchive(path).load(step)
+
+
+def replay(path: str, step: int, player: int = 0, repeat: int = 1, DEBUG=False):
+    warm_up()
+    stage_times: Dict[str, List[float]] = defaultdict(list)
+    all_actions = []
+    for _ in range(repeat):
+        # the turn is loaded again because game_logic updates the objects in place
+        observation, game_state, missions = load_turn(path, step, player)
+        game_state.stage_timer = StageTimer()  # snapshots of older versions do not have one
+        if not isinstance(getattr(game_state, "xy_to_resource_group_id", None), ResourceClusters):
+            game_state.xy_to_resource_group_id = ResourceClusters(game_state.map_width, game_state.map_height)
+        if not hasattr(game_state, "distance_cache"):
+            game_state.distance_cache = DistanceCache()
+        start_time = time.time()
+        actions, game_state, missions = agent.game_logic(game_state, missions, observation, DEBUG=DEBUG)
+        stage_times["game_logic"].append(time.time() - start_time)
+        for stage, seconds in game_state.stage_timer.timings.items():
+            stage_times[stage].append(seconds)
+        all_actions.append(actions)
+
+    return all_actions, stage_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="re-run game_logic on a recorded turn")
+    parser.add_argument("path", help="game archive, or directory of snapshot pickles")
+    parser.add_argument("step", type=int)
+    parser.add_argument("--player", type=int, default=0, help="player of the snapshot pickles")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+
+    all_actions, stage_times = replay(args.path, args.step, args.player, args.repeat, DEBUG=args.debug)
+
+    print("actions", all_actions[0])
+    # the sidetext reports the runtime, which is expected to differ
+    comparable = [[re.sub(r"Runtime: [0-9.]+", "Runtime: -", action) for action in actions] for actions in all_actions]
+    if any(actions != comparable[0] for actions in comparable):
+        print("actions differ between repetitions")
+
+    print("{:<40} {:>10} {:>10} {:>10}".format("stage", "mean ms", "min ms", "max ms"))
+    for label, seconds in stage_times.items():
+        print("{:<40} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+            label, 1000 * sum(seconds) / len(seconds), 1000 * min(seconds), 1000 * max(seconds)))
+
+
+if __name__ == "__main__":
+    main()
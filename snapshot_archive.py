@@ -0,0 +1,178 @@
+import copy
+import mmap
+import pickle
+import struct
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from lux.game import Game, Missions, Observation
+from lux.game_records import parse_updates
+
+# file layout
+#   MAGIC
+#   records, each as the length of the record followed by the zlib compressed pickle of the record
+#   index, stored like a record
+#   offset of the index and MAGIC
+# an archive without the index (the game did not end cleanly) is read by scanning the records
+
+MAGIC = b"LUXSNAP1"
+LENGTH = struct.Struct("<Q")
+
+
+def freeze_turn(observation: Observation, game_state: Game, missions: Missions) -> Dict:
+    """
+    capture a turn, the planes are copied and the objects are pickled because they are updated in place later
+    """
+    game_state = copy.copy(game_state)
+    game_state.map = copy.copy(game_state.map)
+    planes: Dict[str, np.ndarray] = {}
+    for prefix, obj in [("", game_state), ("map.", game_state.map)]:
+        for name, value in list(vars(obj).items()):
+            if isinstance(value, np.ndarray) and value.dtype.kind in "biuf":
+                planes[prefix + name] = value.copy()
+                delattr(obj, name)
+    game_state.update_records = None  # parsed again from the update lines
+
+    return {
+        "step": observation["step"],
+        "player": observation.player,
+        "observation": dict(observation),
+        "game_state": pickle.dumps(game_state, protocol=pickle.HIGHEST_PROTOCOL),
+        "missions": pickle.dumps(missions, protocol=pickle.HIGHEST_PROTOCOL),
+        "planes": planes,
+    }
+
+
+def _xor(a: bytes, b: bytes) -> bytes:
+    # byte-wise delta, exact for every dtype
+    return (np.frombuffer(a, dtype=np.uint8) ^ np.frombuffer(b, dtype=np.uint8)).tobytes()
+
+
+class SnapshotArchiveWriter:
+    # appends the turns of one game into one file
+
+    def __init__(self, filename: str, keyframe_interval=20, compression_level=6):
+        self.filename = filename
+        self.keyframe_interval = keyframe_interval
+        self.compression_level = compression_level
+        self.handle = open(filename, 'wb')
+        self.handle.write(MAGIC)
+        self.index: List[Tuple[int, int, int, bool]] = []  # step, offset, length, is keyframe
+        self.previous_planes: Dict[str, Tuple[str, tuple, bytes]] = {}
+        self.turns_since_keyframe = 0
+
+    def append(self, frozen_turn: Dict):
+        is_keyframe = not self.index or self.turns_since_keyframe >= self.keyframe_interval - 1
+        self.turns_since_keyframe = 0 if is_keyframe else self.turns_since_keyframe + 1
+
+        planes = {}
+        current_planes = {}
+        for name, value in frozen_turn["planes"].items():
+            value = np.ascontiguousarray(value)
+            current = (value.dtype.str, value.shape, value.tobytes())
+            current_planes[name] = current
+            previous = self.previous_planes.get(name)
+            if not is_keyframe and previous and previous[:2] == current[:2]:
+                planes[name] = (current[0], current[1], True, _xor(current[2], previous[2]))
+            else:
+                planes[name] = (current[0], current[1], False, current[2])
+        self.previous_planes = current_planes
+
+        record = dict(frozen_turn, planes=planes, is_keyframe=is_keyframe)
+        offset, length = self._write(record)
+        self.index.append((frozen_turn["step"], offset, length, is_keyframe))
+        self.handle.flush()
+
+    def close(self):
+        if self.handle.closed:
+            return
+        index_offset, _ = self._write({"index": self.index})
+        self.handle.write(LENGTH.pack(index_offset) + MAGIC)
+        self.handle.close()
+
+    def _write(self, record) -> Tuple[int, int]:
+        payload = zlib.compress(pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL), self.compression_level)
+        offset = self.handle.tell()
+        self.handle.write(LENGTH.pack(len(payload)) + payload)
+        return offset, len(payload)
+
+
+class SnapshotArchive:
+    # random access to the turns of an archive, only the records needed for the turn are read
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        with open(filename, 'rb') as handle:
+            self.buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        assert self.buffer[:len(MAGIC)] == MAGIC, "not a snapshot archive"
+        self.index = self._read_index()
+        self.position_of_step = {step: i for i, (step, offset, length, is_keyframe) in enumerate(self.index)}
+
+    def steps(self) -> List[int]:
+        return [step for step, offset, length, is_keyframe in self.index]
+
+    def load_planes(self, step: int) -> Dict[str, np.ndarray]:
+        # decode from the latest keyframe up to the turn
+        position = self.position_of_step[step]
+        start = position
+        while not self.index[start][3]:
+            start -= 1
+        raw_planes: Dict[str, bytes] = {}
+        for i in range(start, position + 1):
+            record_planes = self._read(i)["planes"]
+            for name, (dtype, shape, is_delta, data) in record_planes.items():
+                raw_planes[name] = _xor(data, raw_planes[name]) if is_delta else data
+        planes = {}
+        for name, (dtype, shape, is_delta, data) in record_planes.items():
+            planes[name] = np.frombuffer(raw_planes[name], dtype=dtype).reshape(shape).copy()
+        return planes
+
+    def load_observation(self, step: int) -> Observation:
+        record = self._read(self.position_of_step[step])
+        observation = Observation(record["player"])
+        observation.update(record["observation"])
+        return observation
+
+    def load(self, step: int) -> Tuple[Observation, Game, Missions]:
+        record = self._read(self.position_of_step[step])
+        observation = self.load_observation(step)
+        game_state: Game = pickle.loads(record["game_state"])
+        for name, value in self.load_planes(step).items():
+            obj = game_state
+            if name.startswith("map."):
+                obj, name = game_state.map, name[len("map."):]
+            setattr(obj, name, value)
+        game_state.update_records = parse_updates(observation["updates"])
+        missions: Missions = pickle.loads(record["missions"])
+        return observation, game_state, missions
+
+    def _read(self, position: int) -> Dict:
+        step, offset, length, is_keyframe = self.index[position]
+        return self._read_at(offset)
+
+    def _read_at(self, offset: int) -> Dict:
+        length, = LENGTH.unpack_from(self.buffer, offset)
+        start = offset + LENGTH.size
+        return pickle.loads(zlib.decompress(self.buffer[start:start + length]))
+
+    def _read_index(self):
+        footer = len(self.buffer) - LENGTH.size - len(MAGIC)
+        if footer > len(MAGIC) and self.buffer[footer + LENGTH.size:] == MAGIC:
+            index_offset, = LENGTH.unpack_from(self.buffer, footer)
+            return self._read_at(index_offset)["index"]
+
+        # no index, scan the records that were written completely
+        index = []
+        offset = len(MAGIC)
+        while offset + LENGTH.size <= len(self.buffer):
+            length, = LENGTH.unpack_from(self.buffer, offset)
+            if offset + LENGTH.size + length > len(self.buffer):
+                break
+            record = self._read_at(offset)
+            if "index" in record:
+                break
+            index.append((record["step"], offset, length, record["is_keyframe"]))
+            offset += LENGTH.size + length
+        return index
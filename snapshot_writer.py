@@ -0,0 +1,53 @@
+import atexit
+import os
+import pickle
+import queue
+import threading
+
+
+class SnapshotWriter:
+    # writes the snapshots to disk on a background thread, so that the turn does not wait for the disk
+    # objects are pickled when they are put, because the game objects are updated in place on the next turn
+
+    def __init__(self, maxsize=64, block=False):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.block = block  # when the queue is full, wait for the writer instead of dropping the snapshot
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def put(self, filename: str, obj):
+        if not self.block and self.queue.full():
+            self.dropped += 1
+            return False
+        return self.submit(self._write_file, filename, pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def submit(self, function, *args, droppable=True):
+        # run function(*args) on the writer thread, the arguments should not be modified afterwards
+        if droppable and not self.block and self.queue.full():
+            self.dropped += 1
+            return False
+        self.queue.put((function, args))
+        return True
+
+    def flush(self):
+        # wait until everything in the queue is on disk
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            function, args = self.queue.get()
+            try:
+                function(*args)
+            except OSError:
+                self.dropped += 1
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    def _write_file(filename: str, data: bytes):
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp_filename, filename)
@@ -0,0 +1,18 @@
+"""
+percentiles of the stage timings written by the agent with LUX_TIMING_LOG
+
+LUX_TIMING_LOG=timings.jsonl python main.py ...
+python stage_timings.py timings.jsonl
+"""
+import sys
+
+from lux.stage_timer import summarize
+
+
+if __name__ == "__main__":
+    with open(sys.argv[1]) as handle:
+        summary = summarize(handle)
+    print("{:<40} {:>6} {:>10} {:>10} {:>10}".format("stage", "turns", "p50 ms", "p99 ms", "max ms"))
+    for stage, values in summary.items():
+        print("{:<40} {:>6} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+            stage, values["turns"], values["p50"], values["p99"], values["max"]))